@@ -0,0 +1,56 @@
+"""
+compares write time, load time and size of the cache formats for collections and game details;
+run from the repository root with: python -m bench.bench_cache_format [collection size] [games]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import cache
+from bench.fixtures import collection_dict, game_details_dict
+from cache import formats
+
+
+def available_formats() -> list:
+    return [cache_format for cache_format in formats.CACHE_FILE_SUFFIXES if cache_format != "msgpack" or formats.msgpack is not None]
+
+
+def measure(cache_type: str, cache_format: str, entries: dict) -> tuple:
+    with tempfile.TemporaryDirectory() as cache_root:
+        cache.CACHE_ROOT = cache_root
+        cache.CACHE_FORMATS[cache_type] = cache_format
+        cache._prepared_cache_types.clear()
+
+        start = time.perf_counter()
+        for cache_name, content in entries.items():
+            cache.create_cache(cache_type, cache_name, content)
+        write_time = time.perf_counter() - start
+
+        # read back from disk, not from the memory tier
+        cache._memory_cache.clear()
+        start = time.perf_counter()
+        for cache_name, content in entries.items():
+            assert cache.get_cache(cache_type, cache_name, cache_age_max=1) == content
+        load_time = time.perf_counter() - start
+
+        cache_dir = os.path.join(cache_root, cache_type)
+        size = sum(os.path.getsize(os.path.join(cache_dir, file)) for file in os.listdir(cache_dir))
+        return write_time, load_time, size
+
+
+def main(collection_size: int, games: int) -> None:
+    benchmarks = {
+        "collection": {f"user{user}": collection_dict(collection_size, f"user{user}") for user in range(5)},
+        "game": {str(objectid): game_details_dict(objectid) for objectid in range(1, games + 1)}
+    }
+    print(f"{'type':>10} {'format':>9} {'write s':>9} {'load s':>9} {'size KiB':>9}")
+    for cache_type, entries in benchmarks.items():
+        for cache_format in available_formats():
+            write_time, load_time, size = measure(cache_type, cache_format, entries)
+            print(f"{cache_type:>10} {cache_format:>9} {write_time:>9.3f} {load_time:>9.3f} {size / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [2000, 500][len(args):]))
@@ -0,0 +1,53 @@
+"""
+compares the peak memory of parsing a large collection response from a fully buffered body against the
+incremental stream parser; run from the repository root with: python -m bench.bench_collection_parse [size].
+Both modes do the same parsing work, so their times are only comparable because every measurement starts
+with an empty normalize memo
+"""
+import io
+import sys
+import time
+import tracemalloc
+
+from bench.fixtures import collection_xml
+from bgg.client import BGG_STREAM_CHUNK_SIZE
+from bgg.parse import CollectionStreamParser, parse_collection_xml
+from utils import text
+
+
+def parse_buffered(fixture: io.BytesIO) -> list:
+    return parse_collection_xml(fixture.read(), "benchmark")
+
+
+def parse_streamed(fixture: io.BytesIO) -> list:
+    parser = CollectionStreamParser("benchmark")
+    for chunk in iter(lambda: fixture.read(BGG_STREAM_CHUNK_SIZE), b""):
+        parser.feed(chunk)
+    return parser.close()
+
+
+def measure(parse, content: bytes) -> tuple:
+    fixture = io.BytesIO(content)
+    # start cold, otherwise whichever mode runs second reuses the names normalized by the first
+    text._clean_cached.cache_clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    games = parse(fixture)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(games), elapsed, peak
+
+
+def main(sizes: list) -> None:
+    print(f"{'items':>8} {'mode':>9} {'seconds':>9} {'peak MiB':>9}")
+    for size in sizes:
+        content = collection_xml(size)
+        for mode, parse in (("buffered", parse_buffered), ("streamed", parse_streamed)):
+            games, elapsed, peak = measure(parse, content)
+            assert games == size
+            print(f"{size:>8} {mode:>9} {elapsed:>9.3f} {peak / 2**20:>9.2f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,153 @@
+"""
+generators for bgg xml api responses used by the benchmarks
+"""
+from xml.sax.saxutils import escape
+
+
+GAME_NAME_WORDS = ["Castles", "of", "Burgundy", "Ticket", "to", "Ride:", "Europe", "Terraforming", "Mars", "Azul", "Wingspan", "Catan", "Seafarers", "Root", "Spirit", "Island", "Gloomhaven", "Jaws", "the", "Lion", "Brass", "Birmingham", "Ark", "Nova", "Feast", "Odin", "Everdell", "Cascadia", "Dune:", "Imperium"]
+
+
+def game_name(objectid: int) -> str:
+    words = [GAME_NAME_WORDS[(objectid * 7 + offset * 13) % len(GAME_NAME_WORDS)] for offset in range(1 + objectid % 4)]
+    return f"{' '.join(words)} #{objectid}"
+
+
+def collection_item_xml(objectid: int, owned: bool = True) -> str:
+    return (
+        f'<item objecttype="thing" objectid="{objectid}" subtype="boardgame" collid="{objectid * 3}">'
+        f'<name sortindex="1">{escape(game_name(objectid))}</name>'
+        f'<yearpublished>{1990 + objectid % 34}</yearpublished>'
+        f'<image>https://cf.geekdo-images.com/original/img/pic{objectid}.jpg</image>'
+        f'<thumbnail>https://cf.geekdo-images.com/thumb/img/pic{objectid}.jpg</thumbnail>'
+        f'<status own="{int(owned)}" prevowned="0" fortrade="0" want="0" wanttoplay="0" wanttobuy="0" wishlist="0" preordered="0" lastmodified="2023-01-01 00:00:00" />'
+        f'<numplays>{objectid % 9}</numplays>'
+        '</item>'
+    )
+
+
+def collection_xml(size: int, first_objectid: int = 1) -> bytes:
+    """
+    builds a collection response with size items
+    :param int size: the number of items in the collection
+    :param int first_objectid: the object id of the first item; later items count up from it
+    """
+    items = "".join(collection_item_xml(objectid) for objectid in range(first_objectid, first_objectid + size))
+    return (
+        f'<?xml version="1.0" encoding="utf-8" standalone="yes"?>'
+        f'<items totalitems="{size}" termsofuse="https://boardgamegeek.com/xmlapi/termsofuse" pubdate="Sat, 01 Jan 2023 00:00:00 +0000">'
+        f'{items}</items>'
+    ).encode("utf-8")
+
+
+def collection_dict(size: int, username: str = "benchmark") -> dict:
+    """
+    builds a collection dictionary shaped like the ones get_bgg_collection caches
+    :param int size: the number of games in the collection
+    :param str username: the owner of the collection
+    """
+    games = []
+    for objectid in range(1, size + 1):
+        label = game_name(objectid).replace(":", "").replace("#", "")
+        games.append({
+            "owned_by": [username],
+            "type": "boardgame",
+            "objectid": str(objectid),
+            "label": label,
+            "name": label.lower(),
+            "yearpublished": str(1990 + objectid % 34),
+            "image": f"https://cf.geekdo-images.com/original/img/pic{objectid}.jpg",
+            "thumbnail": f"https://cf.geekdo-images.com/thumb/img/pic{objectid}.jpg",
+            "numplays": str(objectid % 9)
+        })
+    return {
+        "type": "UserCollection",
+        "owner": username,
+        "games": games,
+        "game_list": [game["name"] for game in games],
+        "game_id_list": [game["objectid"] for game in games],
+        "total_games": len(games)
+    }
+
+
+def game_details_dict(objectid: int) -> dict:
+    """
+    builds a game details dictionary shaped like the ones get_game_details caches
+    :param int objectid: the object id of the game
+    """
+    label = game_name(objectid).replace(":", "").replace("#", "")
+    description = " ".join(GAME_NAME_WORDS[(objectid + offset) % len(GAME_NAME_WORDS)] for offset in range(300))
+    suggested_numplayers = [{"numplayers": str(count), "recommendation": "Best" if count == 3 else "Recommended", "votes": 10 * count} for count in range(1, 6)]
+    return {
+        "objectid": str(objectid),
+        "type": "boardgame",
+        "label": label,
+        "name": label.lower(),
+        "description": description,
+        "yearpublished": str(1990 + objectid % 34),
+        "minplayers": "1",
+        "maxplayers": "5",
+        "minplaytime": "60",
+        "maxplaytime": "120",
+        "averagerated": "7.8",
+        "usersrated": "12345",
+        "averageweight": "2.9",
+        "suggested_numplayers": suggested_numplayers,
+        "categories": [{"categoryid": "1002", "label": "card game"}, {"categoryid": "1089", "label": "animals"}],
+        "expansions": [{"objectid": str(objectid * 10), "label": f"{label} Expansion"}],
+        "descriptionshort": description[:400] + "...[more]",
+        "playtime": "60 - 120",
+        "playercount": "1 - 5, Best: 3",
+        "image": f"https://cf.geekdo-images.com/original/img/pic{objectid}.jpg",
+        "thumbnail": f"https://cf.geekdo-images.com/thumb/img/pic{objectid}.jpg"
+    }
+
+
+def thing_item_xml(objectid: int) -> str:
+    name = escape(game_name(objectid))
+    description = escape(" ".join(GAME_NAME_WORDS[(objectid + offset) % len(GAME_NAME_WORDS)] for offset in range(300)))
+    polls = "".join(
+        f'<results numplayers="{count}"><result value="Best" numvotes="{10 * (count == 3)}"/>'
+        f'<result value="Recommended" numvotes="{5 + count}"/><result value="Not Recommended" numvotes="{count}"/></results>'
+        for count in range(1, 6)
+    )
+    return (
+        f'<item type="boardgame" id="{objectid}">'
+        f'<thumbnail>https://cf.geekdo-images.com/thumb/img/pic{objectid}.jpg</thumbnail>'
+        f'<image>https://cf.geekdo-images.com/original/img/pic{objectid}.jpg</image>'
+        f'<name type="primary" sortindex="1" value="{name}"/>'
+        f'<description>{description}</description>'
+        f'<yearpublished value="{1990 + objectid % 34}"/>'
+        '<minplayers value="1"/><maxplayers value="5"/>'
+        f'<poll name="suggested_numplayers" title="User Suggested Number of Players" totalvotes="50">{polls}</poll>'
+        '<playingtime value="120"/><minplaytime value="60"/><maxplaytime value="120"/><minage value="12"/>'
+        '<link type="boardgamecategory" id="1002" value="Card Game"/>'
+        '<link type="boardgamecategory" id="1089" value="Animals"/>'
+        f'<link type="boardgameexpansion" id="{objectid * 10}" value="{name} Expansion"/>'
+        '<statistics page="1"><ratings><usersrated value="12345"/><average value="7.81234"/>'
+        '<bayesaverage value="7.5"/><averageweight value="2.9"/></ratings></statistics>'
+        '</item>'
+    )
+
+
+def thing_xml(objectids: list) -> bytes:
+    """
+    builds a thing?stats=1 response for the given object ids
+    :param list objectids: the object ids to include
+    """
+    items = "".join(thing_item_xml(int(objectid)) for objectid in objectids)
+    return f'<?xml version="1.0" encoding="utf-8"?><items termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">{items}</items>'.encode("utf-8")
+
+
+def search_xml(query: str, size: int, first_objectid: int = 1) -> bytes:
+    """
+    builds a search response with size results named after the query
+    :param str query: the search text
+    :param int size: the number of results
+    :param int first_objectid: the object id of the first result
+    """
+    items = "".join(
+        f'<item type="boardgame" id="{objectid}"><name type="primary" value="{escape(query)} {objectid}"/>'
+        f'<yearpublished value="{1990 + objectid % 34}"/></item>'
+        for objectid in range(first_objectid, first_objectid + size)
+    )
+    return f'<?xml version="1.0" encoding="utf-8"?><items total="{size}" termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">{items}</items>'.encode("utf-8")
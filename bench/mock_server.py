@@ -0,0 +1,115 @@
+"""
+a local stand-in for the bgg xml api serving generated collection, thing and search responses
+with configurable size, latency and 202/429 rates; run standalone with: python -m bench.mock_server
+"""
+import argparse
+import asyncio
+import random
+import zlib
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+from bench.fixtures import collection_xml, search_xml, thing_xml
+
+
+@dataclass
+class MockBggConfig:
+    collection_size: int = 500
+    # items returned for a collection request with modifiedsince, i.e. an incremental refresh
+    modified_items: int = 5
+    search_results: int = 10
+    latency: float = 0.05
+    queued_rate: float = 0.0
+    throttled_rate: float = 0.0
+    # the first requests of each endpoint are always answered with 429, and collection requests then with 202
+    throttled_first: int = 0
+    queued_first: int = 0
+    # the Retry-After header sent with 429s, in seconds or as an http date
+    retry_after: object = None
+    seed: int = 0
+    request_counts: dict = field(default_factory=dict)
+
+
+def _collection_first_objectid(username: str, collection_size: int) -> int:
+    # users get overlapping ranges of games so combined collections have shared owners
+    return (zlib.crc32(username.encode("utf-8")) % 5) * (collection_size // 4) + 1
+
+
+def create_app(config: MockBggConfig) -> web.Application:
+    rng = random.Random(config.seed)
+    collections = {}
+
+    async def respond(request: web.Request, endpoint: str, build_body, queueable: bool = False) -> web.Response:
+        request_count = config.request_counts[endpoint] = config.request_counts.get(endpoint, 0) + 1
+        await asyncio.sleep(config.latency)
+        if request_count <= config.throttled_first or rng.random() < config.throttled_rate:
+            headers = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else {}
+            return web.Response(status=429, text="Rate limit exceeded", headers=headers)
+        if queueable and (request_count <= config.throttled_first + config.queued_first or rng.random() < config.queued_rate):
+            return web.Response(status=202, text="Your request for this collection has been accepted and will be processed.")
+        return web.Response(body=build_body(), content_type="text/xml")
+
+    async def collection(request: web.Request) -> web.Response:
+        username = request.query.get("username", "")
+        first_objectid = _collection_first_objectid(username, config.collection_size)
+
+        def build_body() -> bytes:
+            if "modifiedsince" in request.query:
+                return collection_xml(min(config.modified_items, config.collection_size), first_objectid)
+            if username not in collections:
+                collections[username] = collection_xml(config.collection_size, first_objectid)
+            return collections[username]
+
+        return await respond(request, "collection", build_body, queueable=True)
+
+    async def thing(request: web.Request) -> web.Response:
+        objectids = [objectid for objectid in request.query.get("id", "").split(",") if objectid.isdigit()]
+        return await respond(request, "thing", lambda: thing_xml(objectids))
+
+    async def search(request: web.Request) -> web.Response:
+        query = request.query.get("query", "")
+        size = 1 if request.query.get("exact") == "1" else config.search_results
+        return await respond(request, "search", lambda: search_xml(query, size))
+
+    app = web.Application()
+    app.router.add_get("/xmlapi2/collection", collection)
+    app.router.add_get("/xmlapi2/thing", thing)
+    app.router.add_get("/xmlapi2/search", search)
+    return app
+
+
+async def start_mock_server(config: MockBggConfig, host: str = "127.0.0.1", port: int = 0) -> tuple:
+    """
+    starts the mock server in the running event loop
+    :return: (runner, base url of the xml api); call runner.cleanup() to stop it
+    """
+    runner = web.AppRunner(create_app(config))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}/xmlapi2"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--collection-size", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--queued-rate", type=float, default=0.0)
+    parser.add_argument("--throttled-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockBggConfig(
+        collection_size=args.collection_size,
+        latency=args.latency,
+        queued_rate=args.queued_rate,
+        throttled_rate=args.throttled_rate
+    )
+    print(f"serving a mock bgg xml api at http://127.0.0.1:{args.port}/xmlapi2")
+    web.run_app(create_app(config), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
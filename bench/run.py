@@ -0,0 +1,170 @@
+"""
+benchmarks the bot's hot paths against the local mock bgg server and reports throughput,
+p50/p99 latency and peak memory per scenario; run from the repository root with:
+python -m bench.run [--collection-size N] [--latency S] [--queued-rate R] [--throttled-rate R] ...
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import bgg
+import bot
+import cache
+from bench.mock_server import MockBggConfig, start_mock_server
+from bgg import client, groups, workers
+from utils.metrics import get_metrics, monitor_event_loop_lag
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    operations: int
+    errors: int
+    elapsed: float
+    latencies: list
+    peak_memory: int
+
+    def percentile(self, percent: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class FakeContext:
+    """
+    stands in for a discord command context; collects what the command sends
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.guild = None
+
+    async def send(self, content: str = None, **kwargs) -> None:
+        self.sent.append((content, kwargs))
+
+
+async def run_scenario(name: str, operation, iterations: int, concurrency: int, track_memory: bool) -> ScenarioResult:
+    """
+    runs operation(i) for i in range(iterations), at most concurrency at a time
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def timed(iteration: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await operation(iteration)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[timed(iteration) for iteration in range(iterations)])
+    elapsed = time.perf_counter() - start
+    peak_memory = 0
+    if track_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return ScenarioResult(name, iterations, errors, elapsed, latencies, peak_memory)
+
+
+def print_report(results: list, request_counts: dict, loop_lag: dict) -> None:
+    print(f"{'scenario':<28} {'ops':>6} {'errors':>6} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'peak MiB':>9}")
+    for result in results:
+        throughput = result.operations / result.elapsed if result.elapsed else 0.0
+        print(
+            f"{result.name:<28} {result.operations:>6} {result.errors:>6} {throughput:>9.1f} "
+            f"{result.percentile(50) * 1000:>9.2f} {result.percentile(99) * 1000:>9.2f} {result.peak_memory / 2**20:>9.2f}"
+        )
+    print(f"mock bgg requests: {request_counts}")
+    if loop_lag:
+        print(f"event loop lag: p50 {loop_lag['p50_ms']} ms, p99 {loop_lag['p99_ms']} ms, max {loop_lag['max_ms']} ms")
+
+
+async def main(args: argparse.Namespace) -> None:
+    config = MockBggConfig(
+        collection_size=args.collection_size,
+        latency=args.latency,
+        queued_rate=args.queued_rate,
+        throttled_rate=args.throttled_rate,
+        retry_after=0
+    )
+    runner, base_url = await start_mock_server(config)
+
+    # point the bot at the mock server, a throwaway cache and benchmark friendly limits
+    client.BGG_API_BASE_URL = base_url
+    client.BGG_RETRY_BASE_DELAY = args.retry_delay
+    client.rate_limiter = client.TokenBucket(args.rate_limit, max(1, int(args.rate_limit)))
+    workers.BGG_PARSE_EXECUTOR = args.parse_executor
+    cache_root = tempfile.TemporaryDirectory()
+    cache.CACHE_ROOT = cache_root.name
+    cache._prepared_cache_types.clear()
+
+    usernames = [f"user{user}" for user in range(args.users)]
+    groups.BGG_GROUPS_PATH = os.path.join(cache_root.name, "groups.json")
+    groups.get_group(groups.DEFAULT_GROUP).usernames[:] = usernames
+    game_ids = [str(objectid) for objectid in range(1, args.iterations + 1)]
+    track_memory = not args.no_memory
+
+    scenarios = [
+        ("get_bgg_collection cold", lambda i: bgg.get_bgg_collection(usernames[i % len(usernames)], refresh=True), len(usernames)),
+        ("get_bgg_collection cached", lambda i: bgg.get_bgg_collection(usernames[i % len(usernames)]), args.iterations),
+        ("get_bgg_collection incremental", lambda i: bgg.get_bgg_collection(usernames[i % len(usernames)], refresh=True), args.iterations),
+        ("get_game_details cold", lambda i: bgg.get_game_details(game_ids[i], refresh=True), args.iterations),
+        ("get_game_details cached", lambda i: bgg.get_game_details(game_ids[i % len(game_ids)]), args.iterations),
+        ("get_games_details batch", lambda i: bgg.get_games_details(game_ids, refresh=True), max(1, args.iterations // 20)),
+        ("search_bgg", lambda i: bgg.search_bgg(f"game {i}"), args.iterations),
+        ("combine_bgg_collections", lambda i: _combine(usernames), args.iterations),
+        ("/game in collection", lambda i: bot.game.callback(FakeContext(), game_name="castles"), args.iterations),
+        ("/game bgg fallback", lambda i: bot.game.callback(FakeContext(), game_name=f"unknown game {i}"), args.iterations),
+        ("/combined page", lambda i: bot.combined.callback(FakeContext(), page=i % 5 + 1), args.iterations),
+    ]
+
+    results = []
+    loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag(0.01))
+    try:
+        for name, operation, iterations in scenarios:
+            results.append(await run_scenario(name, operation, iterations, args.concurrency, track_memory))
+    finally:
+        loop_lag_monitor.cancel()
+        await client.close_http_session()
+        workers.shutdown_parse_executor()
+        await runner.cleanup()
+        cache_root.cleanup()
+
+    print_report(results, config.request_counts, get_metrics()["histograms"].get("event_loop_lag"))
+
+
+async def _combine(usernames: list) -> dict:
+    collections, _ = await bgg.get_bgg_collections(usernames)
+    return await bgg.combine_bgg_collections(collections)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--collection-size", type=int, default=500, help="games per mock collection")
+    parser.add_argument("--users", type=int, default=5, help="number of known users")
+    parser.add_argument("--iterations", type=int, default=100, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="operations in flight at once")
+    parser.add_argument("--latency", type=float, default=0.02, help="mock server response latency in seconds")
+    parser.add_argument("--queued-rate", type=float, default=0.0, help="share of collection requests answered with 202")
+    parser.add_argument("--throttled-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--rate-limit", type=float, default=1000.0, help="client requests per second")
+    parser.add_argument("--retry-delay", type=float, default=0.05, help="client retry base delay in seconds")
+    parser.add_argument("--parse-executor", choices=["inline", "thread", "process"], default="inline", help="where xml parsing runs")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc peak memory tracking")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,19 +1,59 @@
-import requests
+import asyncio
+import os
+import time
+from collections import Counter
+import aiohttp
 import xmltodict
-import xml.etree.ElementTree as xml
 
+from bgg.client import QUEUED_RETRY_STATUSES, bgg_get, bgg_stream, iter_chunks
+from bgg.combined import CombinedCollection
+from bgg.parse import CollectionStreamParser, parse_collection_xml, parse_search_xml, parse_things_xml
+from bgg.workers import parses_in_process, run_parse
+
+from catalog import add_games as add_games_to_catalog, run_catalog
 from cache import (
     create_cache, 
     delete_cache, 
     get_cache, 
-    get_cache_age
+    get_cache_age,
+    get_cache_entry_age
 )
 
-from utils.text import normalize
+from utils.metrics import increment, logger, observe, timed
 
 
 collections_known = ['exhaustx', 'wayniackc', 'jchamilton', 'cgaikwad', 'n0ki']
 
+BGG_COLLECTION_CONCURRENCY = int(os.getenv("BGG_COLLECTION_CONCURRENCY", 4))
+# the thing endpoint accepts at most 20 comma separated ids per request
+BGG_THING_MAX_IDS = int(os.getenv("BGG_THING_MAX_IDS", 20))
+GAME_CACHE_AGE_MAX = 24
+COLLECTION_CACHE_AGE_MAX = 6
+# parse collection responses incrementally while they download instead of buffering the whole body
+BGG_STREAM_COLLECTIONS = os.getenv("BGG_STREAM_COLLECTIONS", "1") == "1"
+# refresh cached collections by fetching only the items modified since the newest item already cached;
+# removals from a collection are not reported that way, so a full fetch is still made every
+# BGG_COLLECTION_FULL_REFRESH hours
+BGG_INCREMENTAL_REFRESH = os.getenv("BGG_INCREMENTAL_REFRESH", "1") == "1"
+BGG_COLLECTION_FULL_REFRESH = float(os.getenv("BGG_COLLECTION_FULL_REFRESH", 24))
+
+# upstream fetches currently in flight, shared by concurrent requests for the same thing: key -> task
+_inflight = {}
+_coalesce_stats = {"fetches": 0, "coalesced": 0}
+
+# stale-while-revalidate: expired cache entries up to BGG_CACHE_STALE_MAX hours old are served immediately
+# while they are refreshed in the background, at most BGG_REFRESH_CONCURRENCY refreshes at a time
+BGG_STALE_WHILE_REVALIDATE = os.getenv("BGG_STALE_WHILE_REVALIDATE", "1") == "1"
+BGG_CACHE_STALE_MAX = int(os.getenv("BGG_CACHE_STALE_MAX", 7 * 24))
+BGG_REFRESH_CONCURRENCY = int(os.getenv("BGG_REFRESH_CONCURRENCY", 2))
+# the cache warmer refreshes entries that expire within BGG_WARM_REFRESH_AHEAD hours,
+# along with the BGG_WARM_HOT_GAMES most looked up games
+BGG_WARM_REFRESH_AHEAD = float(os.getenv("BGG_WARM_REFRESH_AHEAD", 1))
+BGG_WARM_HOT_GAMES = int(os.getenv("BGG_WARM_HOT_GAMES", 50))
+
+_refresh_semaphore = None
+_game_lookups = Counter()
+
 
 class BggCollectionTimeoutError(Exception):
     pass
@@ -22,229 +62,476 @@ class BggCollectionTimeoutError(Exception):
 class BggCollectionError(Exception):
     pass
 
+
+class BggGameNotFoundError(Exception):
+    pass
+
+
+class BggRequestError(Exception):
+    pass
+
+
+def _check_response_status(endpoint: str, status_code: int) -> None:
+    """
+    raises BggRequestError for an unsuccessful response, e.g. one that is still throttled once its retries are spent
+    """
+    if status_code != 200:
+        raise BggRequestError(f"BGG could not answer the {endpoint} request right now (status {status_code}); try again shortly")
+
 async def search_bgg(game_name: str, type: str = "boardgame") -> list:
-    resp = requests.get(f"https://boardgamegeek.com/xmlapi2/search?query={game_name}&type=boardgame&exact=1")
-    tree = xml.fromstring(resp.content)
-    items = tree.findall('item')
-    
-    if len(items) > 1:
-        print("trimming exact results")
-        items = [items[0]]
-    elif len(items) == 0:
-        print("failed to find exact search")
-        resp = requests.get(f"https://boardgamegeek.com/xmlapi2/search?query={game_name}&type=boardgame")
-        tree = xml.fromstring(resp.content)
-        items = tree.findall('item')
-
-    search_results = []
-    boardgame_names = []
-    boardgame_game_ids = []
+    resp = await bgg_get("search", {"query": game_name, "type": "boardgame", "exact": 1})
+    _check_response_status("search", resp.status_code)
+    with timed("xml_parse.search"):
+        search_results = await run_parse(parse_search_xml, resp.content)
     
-    for item in items:
-        search_result = {
-            "objectid": item.attrib['id'],
-            "type": item.attrib['type'],
-            "name": normalize(item.find('name').attrib['value'])
-        }
-        
-        search_results.append(search_result)
+    if len(search_results) > 1:
+        logger.debug("trimming exact results")
+        search_results = [search_results[0]]
+    elif len(search_results) == 0:
+        logger.debug("failed to find exact search")
+        resp = await bgg_get("search", {"query": game_name, "type": "boardgame"})
+        _check_response_status("search", resp.status_code)
+        with timed("xml_parse.search"):
+            search_results = await run_parse(parse_search_xml, resp.content)
     
     return search_results
 
 
-async def get_game_details(game: int) -> dict:
+def _get_inflight(key: tuple) -> asyncio.Future:
+    """
+    returns the in-flight upstream fetch for a key and counts the caller as coalesced, or None
+    """
+    task = _inflight.get(key)
+    if task is not None:
+        _coalesce_stats["coalesced"] += 1
+        increment("coalesced_requests")
+    return task
+
+
+def _start_inflight(key: tuple, coro) -> asyncio.Future:
+    """
+    starts an upstream fetch that later callers asking for the same key will share
+    """
+    task = asyncio.ensure_future(coro)
+    _inflight[key] = task
+
+    def forget(_):
+        if _inflight.get(key) is task:
+            del _inflight[key]
+
+    task.add_done_callback(forget)
+    return task
+
+
+async def _coalesce(key: tuple, fetch, throttled: bool = False) -> object:
+    """
+    runs fetch unless an identical fetch is already in flight, in which case its result is shared;
+    the shared fetch keeps running if one of its callers is cancelled
+    :param tuple key: identifies the upstream request, e.g. ("game", "13")
+    :param fetch: a callable returning the coroutine performing the fetch
+    :param bool throttled: a new fetch waits for one of the BGG_REFRESH_CONCURRENCY refresh slots
+    """
+    task = _get_inflight(key)
+    if task is None:
+        _coalesce_stats["fetches"] += 1
+        task = _start_inflight(key, _run_refresh(fetch) if throttled else fetch())
+    return await asyncio.shield(task)
+
+
+def get_coalesce_stats() -> dict:
+    """
+    returns how many upstream fetches were started and how many requests shared an in-flight fetch
+    """
+    return {**_coalesce_stats, "inflight": len(_inflight)}
+
+
+def _get_refresh_semaphore() -> asyncio.Semaphore:
+    global _refresh_semaphore
+    if _refresh_semaphore is None:
+        _refresh_semaphore = asyncio.Semaphore(max(1, BGG_REFRESH_CONCURRENCY))
+    return _refresh_semaphore
+
+
+async def _run_refresh(fetch) -> object:
+    # only the task that performs a fetch may hold a refresh slot; a caller holding one while it waits
+    # for another in-flight refresh could leave every slot waiting on refreshes that need a slot
+    async with _get_refresh_semaphore():
+        return await fetch()
+
+
+def _report_refresh_failure(task: asyncio.Future) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"background cache refresh failed: {str(task.exception())}")
+
+
+def _revalidate_in_background(key: tuple, fetch) -> None:
+    """
+    starts a background refresh for a stale cache entry unless one is already in flight
+    :param tuple key: identifies the upstream request, e.g. ("game", "13")
+    :param fetch: a callable returning the coroutine that refreshes the entry
+    """
+    if key in _inflight:
+        return
+    _coalesce_stats["fetches"] += 1
+    task = _start_inflight(key, _run_refresh(fetch))
+    task.add_done_callback(_report_refresh_failure)
+
+
+def _get_cache_swr(cache_type: str, cache_name: str, cache_age_max: int, key: tuple, fetch, keep_expired: bool = False) -> object:
+    """
+    reads the cache, serving expired entries while they are refreshed when stale-while-revalidate is on
+    :param bool keep_expired: keep entries too old to serve on disk, for a fetch that refreshes them incrementally
+    """
+    if not BGG_STALE_WHILE_REVALIDATE:
+        return get_cache(cache_type, cache_name, cache_age_max=cache_age_max, keep_expired=keep_expired)
+    return get_cache(
+        cache_type,
+        cache_name,
+        cache_age_max=cache_age_max,
+        revalidate=lambda: _revalidate_in_background(key, fetch),
+        cache_stale_max=BGG_CACHE_STALE_MAX,
+        keep_expired=keep_expired
+    )
+
+
+async def _fetch_games_details(game_ids: list) -> list:
+    """
+    requests the details for up to BGG_THING_MAX_IDS games with a single thing request
+    :param list game_ids: the bgg object ids of the games to grab
+    """
+    resp = await bgg_get("thing", {"id": ",".join(game_ids), "stats": 1})
+    _check_response_status("thing", resp.status_code)
+
+    with timed("xml_parse.thing"):
+        return await run_parse(parse_things_xml, resp.content)
+
+
+async def _fetch_and_cache_games_details(game_ids: list) -> dict:
+    logger.info(f"fetching details for {len(game_ids)} games from bgg")
+    games_details = {}
+    for game_details in await _fetch_games_details(game_ids):
+        create_cache("game", game_details['objectid'], game_details)
+        games_details[game_details['objectid']] = game_details
+    await run_catalog(add_games_to_catalog, list(games_details.values()))
+    return games_details
+
+
+async def _get_game_from_batch(batch: asyncio.Future, game_id: str) -> dict:
+    games_details = await asyncio.shield(batch)
+    if game_id not in games_details:
+        raise BggGameNotFoundError(f"No game found on BGG with id {game_id}")
+    return games_details[game_id]
+
+
+async def get_game_details(game: int, refresh: bool = False) -> dict:
+    """
+    retrieves the details of a game
+    :param int game: the bgg object id of the game
+    :param bool refresh: skip the cache and fetch the game from bgg
+    """
     game_id = str(game)
+    key = ("game", game_id)
+    fetch = lambda: _get_game_from_batch(_fetch_and_cache_games_details([game_id]), game_id)
 
-    cached_game = get_cache("game", game_id, cache_age_max=24)
-    if cached_game != None: 
-        print(f"Using {game_id}'s cached game details")
-        return cached_game
-    else:
-        resp = requests.get(f"https://boardgamegeek.com/xmlapi2/thing?id={game_id}&stats=1")
-        if resp.status_code == 429:
-            print("--[WARNING: BGG rate limit throttling causing slow requests]--")
-            time.sleep(2)
-            resp = requests.get(f"https://boardgamegeek.com/xmlapi2/thing?id={game_id}&stats=1")
-
-        game_details = {}
-        tree = xml.fromstring(resp.content)
-        item = tree.find('item')
-        items = tree.findall('item')
-
-        # create expansions list
-        boardgame_categories = []
-        expansions = [] 
-        for link in item.findall('link'):
-            if link.attrib['type'] == 'boardgameexpansion':
-                expansions.append(
-                    {
-                        "objectid": link.attrib['id'],
-                        "label": normalize(link.attrib['value'])
-                    }
-                )
-            elif link.attrib['type'] == 'boardgamecategory':
-                boardgame_categories.append(
-                    {
-                        "categoryid": link.attrib['id'],
-                        "label": normalize(link.attrib['value'], to_lower=True)
-                    }
-                )
-        
-        if 2687 in boardgame_categories:
-            object_type = "boardgamefanexpansion"
-        else:    
-            object_type = item.attrib['type']
-
-        # create list of the suggested player counts based on the user poll
-        suggested_numplayers = [] 
-        for poll in item.findall('poll'):
-            if poll.attrib['name'] == 'suggested_numplayers':
-                for result in poll.findall('results'):
-                    recommendation = None
-                    recommendation_votes = 0
-                    for value in result.findall('result'):
-                        if int(value.attrib['numvotes']) > recommendation_votes:
-                            recommendation = value.attrib['value']
-                            recommendation_votes = int(value.attrib['numvotes'])
-                    
-                    suggested_numplayers.append(
-                        {
-                            "numplayers": result.attrib['numplayers'],
-                            "recommendation": recommendation,
-                            "votes": recommendation_votes
-                        }
-                    )
-
-        game_details = {
-            "objectid": item.attrib['id'],
-            "type": object_type,
-            "label": normalize(item.find('name').attrib['value']),
-            "name": normalize(item.find('name').attrib['value'], True),
-            "description": normalize(item.find('description').text),
-            "yearpublished": item.find('yearpublished').attrib['value'],
-            "minplayers": item.find('minplayers').attrib['value'],
-            "maxplayers": item.find('maxplayers').attrib['value'],
-            "minplaytime": item.find('minplaytime').attrib['value'],
-            "maxplaytime": item.find('maxplaytime').attrib['value'],
-            "averagerated": str(round(float(item.find('statistics').find('ratings').find('average').attrib['value']), 1)),
-            "usersrated": item.find('statistics').find('ratings').find('usersrated').attrib['value'],
-            "averageweight": item.find('statistics').find('ratings').find('averageweight').attrib['value'],
-            "suggested_numplayers": suggested_numplayers,
-            "categories": boardgame_categories,
-            "expansions": expansions
-        }
-
-        game_details['descriptionshort'] = (game_details['description'][:400] + '...[more]') if len(game_details['description']) > 400 else game_details['description']
-        game_details['playtime'] = f"{game_details['minplaytime']} - {game_details['maxplaytime']}"
-        game_details['playercount'] = f"{game_details['minplayers']} - {game_details['maxplayers']}, Best: {'/'.join([recommendation['numplayers'] for recommendation in game_details['suggested_numplayers'] if recommendation['recommendation'] == 'Best'])}"
-
-        try: 
-            game_details['image'] = item.find('image').text
-            game_details['thumbnail'] = item.find('thumbnail').text
-        except AttributeError: 
-            game_details["image"] = "https://cf.geekdo-images.com/zxVVmggfpHJpmnJY9j-k1w__imagepagezoom/img/RO6wGyH4m4xOJWkgv6OVlf6GbrA=/fit-in/1200x900/filters:no_upscale():strip_icc()/pic1657689.jpg"
-            game_details["thumbnail"] = "https://cf.geekdo-images.com/zxVVmggfpHJpmnJY9j-k1w__imagepagezoom/img/RO6wGyH4m4xOJWkgv6OVlf6GbrA=/fit-in/1200x900/filters:no_upscale():strip_icc()/pic1657689.jpg" 
-
-        return game_details
-
-
-async def get_bgg_collection(username: str, owned_only: bool=True, include_status: bool=False) -> dict:
+    if not refresh:
+        _game_lookups[game_id] += 1
+        cached_game = _get_cache_swr("game", game_id, GAME_CACHE_AGE_MAX, key, fetch)
+        if cached_game != None: 
+            logger.debug(f"using {game_id}'s cached game details")
+            return cached_game
+
+    return await _coalesce(key, fetch)
+
+
+async def get_games_details(games: list, refresh: bool = False) -> dict:
+    """
+    retrieves the details of many games, using the cache where possible and batching the rest
+    into multi-id thing requests of at most BGG_THING_MAX_IDS games each
+    :param list games: the bgg object ids of the games to grab
+    :param bool refresh: skip the cache and fetch every game from bgg
+    :return: a dictionary of object id -> game details; ids bgg does not know are left out
+    """
+    return await _get_games_details(games, refresh)
+
+
+async def _get_games_details(games: list, refresh: bool, throttled: bool = False) -> dict:
+    """
+    :param bool throttled: each new batch request waits for one of the BGG_REFRESH_CONCURRENCY refresh slots
+    """
+    games_details = {}
+    missing_game_ids = []
+    for game in games:
+        game_id = str(game)
+        if game_id in games_details or game_id in missing_game_ids:
+            continue
+        cached_game = None if refresh else get_cache("game", game_id, cache_age_max=GAME_CACHE_AGE_MAX)
+        if cached_game != None:
+            games_details[game_id] = cached_game
+        else:
+            missing_game_ids.append(game_id)
+
+    # share games that are already being fetched and batch the rest
+    pending = {}
+    game_ids_to_fetch = []
+    for game_id in missing_game_ids:
+        task = _get_inflight(("game", game_id))
+        if task is not None:
+            pending[game_id] = task
+        else:
+            game_ids_to_fetch.append(game_id)
+
+    for chunk_start in range(0, len(game_ids_to_fetch), BGG_THING_MAX_IDS):
+        chunk = game_ids_to_fetch[chunk_start:chunk_start + BGG_THING_MAX_IDS]
+        _coalesce_stats["fetches"] += 1
+        fetch = lambda chunk=chunk: _fetch_and_cache_games_details(chunk)
+        batch = asyncio.ensure_future(_run_refresh(fetch) if throttled else fetch())
+        for game_id in chunk:
+            pending[game_id] = _start_inflight(("game", game_id), _get_game_from_batch(batch, game_id))
+
+    results = await asyncio.gather(*[asyncio.shield(task) for task in pending.values()], return_exceptions=True)
+    for game_id, result in zip(pending, results):
+        if isinstance(result, BggGameNotFoundError):
+            continue
+        elif isinstance(result, BaseException):
+            raise result
+        games_details[game_id] = result
+
+    return games_details
+
+
+def _check_collection_status(username: str, status_code: int, content: bytes) -> None:
+    if status_code == 202:
+        raise BggCollectionTimeoutError(f"{username}'s Collection has been requested, but BGG did not make it available in time; try again shortly")
+    elif status_code != 200:
+        raise BggCollectionError(status_code, content)
+
+
+async def _stream_collection_games(username: str, params: dict, include_status: bool) -> list:
+    """
+    requests a collection and parses its items while the response is still being received
+    """
+    async with bgg_stream("collection", params, retry_statuses=QUEUED_RETRY_STATUSES) as resp:
+        if resp.status != 200:
+            _check_collection_status(username, resp.status, await resp.read())
+
+        if parses_in_process():
+            # a stream parser cannot be shared with another process, so hand over the whole body
+            content = await resp.read()
+            with timed("xml_parse.collection"):
+                return await run_parse(parse_collection_xml, content, username, include_status)
+
+        # chunks are fed one at a time, so with a thread pool the parser is never used concurrently
+        parser = CollectionStreamParser(username, include_status)
+        parse_time = 0.0
+        async for chunk in iter_chunks(resp):
+            start = time.perf_counter()
+            await run_parse(parser.feed, chunk)
+            parse_time += time.perf_counter() - start
+        start = time.perf_counter()
+        games = await run_parse(parser.close)
+        observe("xml_parse.collection", (parse_time + time.perf_counter() - start) * 1000)
+        return games
+
+
+def _get_collection_fetch(username: str, owned_only: bool, include_status: bool, full: bool = False) -> tuple:
+    """
+    returns the in-flight key and the fetch callable for a collection request; full fetches are never
+    shared with incremental ones, which could not drop games removed from the collection
+    """
+    key = ("collection", username, owned_only, include_status, full)
+    return key, lambda: _fetch_and_cache_collection(username, owned_only, include_status, full)
+
+
+async def get_bgg_collection(username: str, owned_only: bool=True, include_status: bool=False, refresh: bool=False, full: bool=False) -> dict:
     """
     retreievee a boardgamegeek collection by username
     :param str username: the bgg username of the collection to grab
     :param bool owned_only: only return games from the user's collection that they own
     :param bool include_status: will exclude user game status for items in the collection (owned, want to buy, for trade, etc)
+    :param bool refresh: skip the cache and fetch the collection from bgg; with BGG_INCREMENTAL_REFRESH only
+        the games changed since the cached copy are fetched and merged into it
+    :param bool full: fetch the whole collection rather than only its changes, so games removed from it
+        on bgg are dropped too
     """
-    resp_code = 0
-    attempts = 0
-    cached_collection = get_cache("collection", username)
-    if cached_collection != None: 
-        print(f"Using {username}'s cached collection")
-        return cached_collection
-    
-    try: 
-        while resp_code != 200:
-            print(f"Refreshing {username}'s collection cache from bgg...")
-            if owned_only:
-                resp = requests.get(f"https://boardgamegeek.com/xmlapi2/collection?username={username}&own=1")
-            else:
-                resp = requests.get(f"https://boardgamegeek.com/xmlapi2/collection?username={username}")
-
-            if resp.status_code == 200:
-                resp_code = 200
-            elif resp.status_code == 202:
-                raise BggCollectionTimeoutError(f"{username}'s Collection has been requested, waiting on collection to be made available by BGG...")
-                time.sleep(5)
-            else: 
-                raise BggCollectionError(resp.status_code, resp.content)
-
-    except BggCollectionTimeoutError as e:
-        raise e
-    except BggCollectionError as e:
-        raise e
-
-    tree = xml.fromstring(resp.content)
+    key, fetch = _get_collection_fetch(username, owned_only, include_status, full)
+
+    if not refresh:
+        # an expired collection is kept so the fetch below can refresh it incrementally
+        cached_collection = _get_cache_swr("collection", username, COLLECTION_CACHE_AGE_MAX, key, fetch, keep_expired=BGG_INCREMENTAL_REFRESH)
+        if cached_collection != None: 
+            logger.debug(f"using {username}'s cached collection")
+            return cached_collection
+
+    return await _coalesce(key, fetch)
+
+
+async def _fetch_collection_games(username: str, params: dict) -> list:
+    """
+    requests a collection and returns its games, always with their status so modification times are known
+    """
+    if BGG_STREAM_COLLECTIONS:
+        return await _stream_collection_games(username, params, True)
+
+    resp = await bgg_get("collection", params, retry_statuses=QUEUED_RETRY_STATUSES)
+    _check_collection_status(username, resp.status_code, resp.content)
+    with timed("xml_parse.collection"):
+        return await run_parse(parse_collection_xml, resp.content, username, True)
+
+
+def _get_incremental_base(username: str, owned_only: bool, include_status: bool) -> dict:
+    """
+    returns the cached collection an incremental refresh can build on, or None when a full fetch is needed
+    """
+    if not BGG_INCREMENTAL_REFRESH:
+        return None
+    cached_collection = get_cache("collection", username, cache_age_max=float("inf"))
+    if cached_collection is None or not cached_collection.get("lastmodified"):
+        return None
+    if cached_collection.get("owned_only") != owned_only or cached_collection.get("include_status") != include_status:
+        return None
+    if time.time() - cached_collection.get("full_refreshed_at", 0) > BGG_COLLECTION_FULL_REFRESH * 60 * 60:
+        return None
+    return cached_collection
+
+
+def _is_kept(game: dict, owned_only: bool) -> bool:
+    return not owned_only or game.get('status', {}).get('own') == "1"
+
+
+async def _fetch_and_cache_collection(username: str, owned_only: bool, include_status: bool, full: bool = False) -> dict:
+    base_collection = None if full else _get_incremental_base(username, owned_only, include_status)
+    params = {"username": username}
+
+    if base_collection is None:
+        logger.info(f"refreshing {username}'s collection cache from bgg")
+        if owned_only:
+            params["own"] = 1
+        games = await _fetch_collection_games(username, params)
+        full_refreshed_at = time.time()
+        changed_games = kept_games = games
+    else:
+        # without own=1, so games that are no longer owned come back too and can be dropped
+        logger.info(f"refreshing {username}'s collection cache from bgg with changes since {base_collection['lastmodified']}")
+        params["modifiedsince"] = base_collection["lastmodified"]
+        changed_games = await _fetch_collection_games(username, params)
+        increment("collection_incremental_refreshes")
+        changed_ids = {game['objectid'] for game in changed_games}
+        # unchanged games are shared with the cached collection, which is never modified
+        kept_games = [game for game in changed_games if _is_kept(game, owned_only)]
+        games = [game for game in base_collection["games"] if game['objectid'] not in changed_ids] + kept_games
+        full_refreshed_at = base_collection["full_refreshed_at"]
+
+    lastmodified = max((game['status'].get('lastmodified', "") for game in changed_games), default="")
+    if not include_status:
+        for game in changed_games:
+            game.pop('status', None)
+
     collection = {
         "type": "UserCollection",
         "owner": username,
-        "games": []
+        "games": games
     }
 
-    for child in tree.findall('item'):
-        game = {}
-        game["owned_by"] = [username]
-        game["type"] = child.attrib["subtype"]
-        game["objectid"] = child.attrib["objectid"]
-        for item in child: 
-            if(item.tag == 'status'):
-                if include_status: 
-                    game[item.tag] = item.attrib
-            elif(item.tag == 'name'):
-                game['label'] = normalize(item.text)
-                game[item.tag] = normalize(game['label'], True)
-            else: 
-                game[item.tag] = item.text
-        
-        collection["games"].append(game)
-
     collection["game_list"] = [game['name'] for game in collection["games"]]
     collection["game_id_list"] = [game['objectid'] for game in collection["games"]]
     collection["total_games"] = len(collection["game_list"])
+    collection["owned_only"] = owned_only
+    collection["include_status"] = include_status
+    collection["lastmodified"] = max(lastmodified, base_collection["lastmodified"] if base_collection else "")
+    collection["full_refreshed_at"] = full_refreshed_at
 
     create_cache("collection", username, collection)
+    await run_catalog(add_games_to_catalog, kept_games)
     return collection
 
 
+async def get_bgg_collections(usernames: list, max_concurrency: int = BGG_COLLECTION_CONCURRENCY, **kwargs) -> tuple:
+    """
+    retrieves several boardgamegeek collections concurrently
+    :param list usernames: the bgg usernames of the collections to grab
+    :param int max_concurrency: the maximum number of collections fetched at the same time
+    :param kwargs: passed through to get_bgg_collection
+    :return: (collections, errors) where collections are in the order of usernames and errors
+        is a list of (username, exception) for collections that could not be retrieved, including
+        users whose request failed to connect or timed out
+    """
+    # a copy, since the caller's list, e.g. a group's users, may change while the collections are fetched
+    usernames = list(usernames)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def fetch(username: str) -> dict:
+        async with semaphore:
+            return await get_bgg_collection(username, **kwargs)
+
+    results = await asyncio.gather(*[fetch(username) for username in usernames], return_exceptions=True)
+
+    collections = []
+    errors = []
+    for username, result in zip(usernames, results):
+        if isinstance(result, (BggCollectionTimeoutError, BggCollectionError, aiohttp.ClientError, asyncio.TimeoutError)):
+            errors.append((username, result))
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            collections.append(result)
+
+    return collections, errors
+
+
+async def warm_caches(usernames: list, hot_games: int = BGG_WARM_HOT_GAMES, refresh_ahead: float = BGG_WARM_REFRESH_AHEAD) -> list:
+    """
+    refreshes the collections of usernames and the most looked up games when their cache entries are
+    missing or expire within refresh_ahead hours; refreshes go through the shared bgg rate limit
+    :param list usernames: the bgg usernames whose collections should be kept warm
+    :param int hot_games: how many of the most looked up games to keep warm
+    :param float refresh_ahead: how many hours before expiry an entry is refreshed
+    :return: the collections that were refreshed
+    """
+    def refresh_due(cache_type: str, cache_name: str, cache_age_max: int) -> bool:
+        cache_age = get_cache_entry_age(cache_type, cache_name)
+        return cache_age is None or cache_age > (cache_age_max - refresh_ahead) * 60 * 60
+
+    due_usernames = [username for username in usernames if refresh_due("collection", username, COLLECTION_CACHE_AGE_MAX)]
+    due_game_ids = [game_id for game_id, _ in _game_lookups.most_common(hot_games) if refresh_due("game", game_id, GAME_CACHE_AGE_MAX)]
+    if not due_usernames and not due_game_ids:
+        return []
+    logger.info(f"warming caches for {len(due_usernames)} collections and {len(due_game_ids)} games")
+
+    # joins refreshes that are already in flight; only the fetches started here take refresh slots
+    results = await asyncio.gather(
+        *[_coalesce(*_get_collection_fetch(username, True, False), throttled=True) for username in due_usernames],
+        return_exceptions=True
+    )
+    refreshed_collections = []
+    for username, result in zip(due_usernames, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"failed to warm {username}'s collection cache: {str(result)}")
+        else:
+            refreshed_collections.append(result)
+
+    if due_game_ids:
+        try:
+            await _get_games_details(due_game_ids, refresh=True, throttled=True)
+        except Exception as e:
+            logger.warning(f"failed to warm game caches: {str(e)}")
+
+    return refreshed_collections
+
+
 async def combine_bgg_collections(collections: list) -> dict:
     """
     combines N number of boardgame collections into a single total collection
     :param list collections: a list of collection dictionaries; collections are returned by get_bgg_collection
     """
-    source_collection = collections.pop(0)
-    total_collection = source_collection
-    total_collection['type'] = "CombinedUserCollection"
-    total_collection['owner'] = [source_collection['owner']]
-
+    total_collection = CombinedCollection()
     for collection in collections:
         try:
-            total_collection['owner'].append(collection['owner'])
-            for game in collection["games"]:
-                if game['name'] not in total_collection['game_list']:
-                    total_collection['game_list'].append(game['name'])
-                    total_collection['game_id_list'].append(game['objectid'])
-                    total_collection['games'].append(game)
-                else:
-                    for total_collection_game in total_collection['games']:
-                        if total_collection_game['name'] == game['name']:
-                            total_collection_game["owned_by"].append(collection['owner'])
+            total_collection.update_collection(collection)
         except Exception as e:
-            print(f"failed to add {total_collection['owner']}'s collection to the combined collection: {str(e)}")
+            logger.warning(f"failed to add {collection.get('owner')}'s collection to the combined collection: {str(e)}")
             pass
 
-    total_collection["game_list"] = sorted(total_collection["game_list"], reverse=False)
-    total_collection["game_id_list"] = sorted(total_collection["game_id_list"], reverse=False)
-    total_collection["total_games"] = len(total_collection["game_list"])
-    return total_collection
+    return total_collection.to_dict()
 
 
 async def get_game_from_collection(game_name: str, collection: dict) -> dict:
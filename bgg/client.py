@@ -0,0 +1,201 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+from utils.metrics import increment, logger, observe
+
+
+BGG_API_BASE_URL = os.getenv("BGG_API_BASE_URL", "https://boardgamegeek.com/xmlapi2")
+BGG_HTTP_MAX_CONNECTIONS = int(os.getenv("BGG_HTTP_MAX_CONNECTIONS", 10))
+BGG_HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("BGG_HTTP_KEEPALIVE_TIMEOUT", 30))
+BGG_HTTP_TIMEOUT = float(os.getenv("BGG_HTTP_TIMEOUT", 30))
+BGG_STREAM_CHUNK_SIZE = int(os.getenv("BGG_STREAM_CHUNK_SIZE", 64 * 1024))
+
+# every request to bgg shares one token bucket: BGG_RATE_LIMIT requests per second on average,
+# with bursts of up to BGG_RATE_BURST requests
+BGG_RATE_LIMIT = float(os.getenv("BGG_RATE_LIMIT", 2))
+BGG_RATE_BURST = int(os.getenv("BGG_RATE_BURST", 4))
+
+# retried responses back off exponentially from BGG_RETRY_BASE_DELAY up to BGG_RETRY_MAX_DELAY seconds,
+# and a request gives up once it would have waited more than BGG_RETRY_MAX_WAIT seconds in total
+BGG_RETRY_BASE_DELAY = float(os.getenv("BGG_RETRY_BASE_DELAY", 2))
+BGG_RETRY_MAX_DELAY = float(os.getenv("BGG_RETRY_MAX_DELAY", 30))
+BGG_RETRY_MAX_WAIT = float(os.getenv("BGG_RETRY_MAX_WAIT", 120))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# bgg answers 202 while it queues up a collection export; the same request succeeds once it is ready
+QUEUED_RETRY_STATUSES = RETRY_STATUSES | {202}
+
+_session = None
+
+
+@dataclass
+class BggResponse:
+    status_code: int
+    content: bytes
+    headers: dict
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Returns the shared http session used for every bgg request, creating it on first use.
+    The session keeps a pool of keep-alive connections to the bgg api so concurrent
+    commands reuse sockets instead of opening a new connection per request
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=BGG_HTTP_MAX_CONNECTIONS,
+            keepalive_timeout=BGG_HTTP_KEEPALIVE_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=BGG_HTTP_TIMEOUT)
+        )
+    return _session
+
+
+async def close_http_session() -> None:
+    """
+    Closes the shared http session; call on bot shutdown
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+class TokenBucket:
+    """
+    Async token bucket rate limiter; acquire waits until a token is available
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        # the lock hands out tokens in arrival order
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+rate_limiter = TokenBucket(BGG_RATE_LIMIT, BGG_RATE_BURST)
+
+
+def _get_retry_after(headers) -> float:
+    """
+    Returns the delay requested by a Retry-After header in seconds, or None when there is none
+    """
+    retry_after = headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_retry_delay(attempt: int, headers) -> float:
+    """
+    Returns how long to wait before retrying, honoring Retry-After and otherwise backing off
+    exponentially with jitter
+    :param int attempt: the number of retries already made for the request
+    """
+    retry_after = _get_retry_after(headers)
+    if retry_after is not None:
+        return retry_after
+    delay = min(BGG_RETRY_MAX_DELAY, BGG_RETRY_BASE_DELAY * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def _send(endpoint: str, params: dict, retry_statuses: frozenset) -> aiohttp.ClientResponse:
+    """
+    Sends a rate limited GET request, retrying responses with a status in retry_statuses;
+    returns the last response once it succeeds or the retry budget is spent. The caller has to release it
+    """
+    session = get_http_session()
+    waited = 0.0
+    attempt = 0
+    while True:
+        await rate_limiter.acquire()
+        start = time.perf_counter()
+        resp = await session.get(f"{BGG_API_BASE_URL}/{endpoint}", params=params)
+        observe(f"bgg_request.{endpoint}", (time.perf_counter() - start) * 1000)
+        increment(f"bgg_status.{resp.status}")
+        if resp.status not in retry_statuses:
+            return resp
+
+        delay = _get_retry_delay(attempt, resp.headers)
+        if waited + delay > BGG_RETRY_MAX_WAIT:
+            logger.warning(f"giving up on BGG {endpoint} request after waiting {waited:.1f}s")
+            return resp
+
+        resp.release()
+        logger.warning(f"BGG answered {endpoint} request with {resp.status}, retrying in {delay:.1f}s")
+        increment("bgg_retries")
+        await asyncio.sleep(delay)
+        waited += delay
+        attempt += 1
+
+
+async def bgg_get(endpoint: str, params: dict, retry_statuses: frozenset = RETRY_STATUSES) -> BggResponse:
+    """
+    Performs a GET request against the bgg xml api without blocking the event loop
+    :param str endpoint: the xml api endpoint, e.g. "collection" | "thing" | "search"
+    :param dict params: query string parameters for the request
+    :param frozenset retry_statuses: response statuses that are retried with backoff
+    """
+    resp = await _send(endpoint, params, retry_statuses)
+    try:
+        content = await resp.read()
+        return BggResponse(resp.status, content, dict(resp.headers))
+    finally:
+        resp.release()
+
+
+@asynccontextmanager
+async def bgg_stream(endpoint: str, params: dict, retry_statuses: frozenset = RETRY_STATUSES):
+    """
+    Performs a GET request against the bgg xml api and yields the response before its body is read,
+    so the body can be consumed in chunks with iter_chunks
+    :param str endpoint: the xml api endpoint, e.g. "collection" | "thing" | "search"
+    :param dict params: query string parameters for the request
+    :param frozenset retry_statuses: response statuses that are retried with backoff
+    """
+    resp = await _send(endpoint, params, retry_statuses)
+    try:
+        yield resp
+    finally:
+        resp.release()
+
+
+async def iter_chunks(resp: aiohttp.ClientResponse):
+    """
+    Yields the body of a streamed response in chunks of BGG_STREAM_CHUNK_SIZE bytes
+    :param aiohttp.ClientResponse resp: a response yielded by bgg_stream
+    """
+    async for chunk in resp.content.iter_chunked(BGG_STREAM_CHUNK_SIZE):
+        yield chunk
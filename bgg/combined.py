@@ -0,0 +1,154 @@
+from bgg.search import SearchIndex
+from utils.metrics import timed
+
+
+class CombinedCollection:
+    """
+    A combined view of several user collections keyed by bgg object id.
+
+    Each user's collection is tracked as a separate contribution, so adding, refreshing or
+    removing one user only touches that user's games instead of rebuilding the whole combination.
+    A search index over the combined game names is kept up to date the same way.
+    The collections passed in are never modified.
+    """
+
+    def __init__(self, collections: list = None):
+        self._sources = {}        # owner -> the collection dict that was added for them
+        self._contributions = {}  # owner -> {objectid: game}
+        self._owners = {}         # objectid -> {owner: None}, an insertion ordered set of owners
+        self._snapshot = None
+        self._sorted_ids = None
+        self._search_index = SearchIndex()
+        for collection in collections or []:
+            self.update_collection(collection)
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def __contains__(self, objectid: str) -> bool:
+        return str(objectid) in self._owners
+
+    @property
+    def owners(self) -> list:
+        return list(self._sources)
+
+    def update_collection(self, collection: dict) -> bool:
+        """
+        adds a user's collection, replacing their previous contribution if they were already combined
+        :param dict collection: a collection dictionary returned by get_bgg_collection
+        :return: False when this exact collection was already combined and nothing changed
+        """
+        owner = collection['owner']
+        if self._sources.get(owner) is collection:
+            return False
+
+        with timed("collection_merge"):
+            contribution = {game['objectid']: game for game in collection['games']}
+            previous = self._contributions.get(owner, {})
+            # only games that were added, removed or changed are re-merged, so applying an
+            # incrementally refreshed collection costs as much as its changes
+            removed = [objectid for objectid in previous if objectid not in contribution]
+            changed = [objectid for objectid, game in contribution.items() if previous.get(objectid) != game]
+            for objectid in removed:
+                game_owners = self._owners[objectid]
+                del game_owners[owner]
+                if not game_owners:
+                    del self._owners[objectid]
+            for objectid in changed:
+                self._owners.setdefault(objectid, {})[owner] = None
+
+            self._sources[owner] = collection
+            self._contributions[owner] = contribution
+            if removed or changed:
+                self._snapshot = None
+                self._sorted_ids = None
+                self._reindex_games(removed + changed)
+        return True
+
+    def remove_collection(self, owner: str) -> None:
+        """
+        removes a user's contribution from the combined collection
+        :param str owner: the bgg username whose games should be removed
+        """
+        contribution = self._contributions.pop(owner, None)
+        self._sources.pop(owner, None)
+        if contribution is None:
+            return
+
+        for objectid in contribution:
+            game_owners = self._owners[objectid]
+            del game_owners[owner]
+            if not game_owners:
+                del self._owners[objectid]
+        self._snapshot = None
+        self._sorted_ids = None
+        self._reindex_games(list(contribution))
+
+    def _reindex_games(self, objectids: list) -> None:
+        for objectid in objectids:
+            game_owners = self._owners.get(objectid)
+            if game_owners:
+                first_owner = next(iter(game_owners))
+                self._search_index.add(objectid, self._contributions[first_owner][objectid]['name'])
+            else:
+                self._search_index.remove(objectid)
+
+    def search(self, query: str, limit: int = None, fuzzy: bool = True) -> list:
+        """
+        finds combined games by name, best matches first
+        :param str query: the normalized search text
+        :param int limit: the maximum number of results to return
+        :param bool fuzzy: include games whose names only loosely match the query
+        :return: a list of (rank, game) tuples where rank is one of the bgg.search MATCH_* constants
+        """
+        return [(rank, self.get_game(objectid)) for rank, objectid in self._search_index.search(query, limit, fuzzy)]
+
+    def get_game(self, objectid: str) -> dict:
+        """
+        returns a combined game with the owners of every added collection that has it, or None
+        :param str objectid: the bgg object id of the game
+        """
+        game_owners = self._owners.get(str(objectid))
+        if not game_owners:
+            return None
+        first_owner = next(iter(game_owners))
+        return dict(self._contributions[first_owner][str(objectid)], owned_by=list(game_owners))
+
+    def _get_name(self, objectid: str) -> str:
+        first_owner = next(iter(self._owners[objectid]))
+        return self._contributions[first_owner][objectid]['name']
+
+    def list_games(self, offset: int = 0, limit: int = None) -> list:
+        """
+        returns combined games ordered by name; only the requested slice is built, so listing one page
+        of a large combined collection does not copy every game
+        :param int offset: the number of games to skip
+        :param int limit: the maximum number of games to return
+        """
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self._owners, key=self._get_name)
+        end = None if limit is None else offset + limit
+        return [self.get_game(objectid) for objectid in self._sorted_ids[offset:end]]
+
+    def games(self) -> list:
+        """
+        returns every combined game, each with its list of owners
+        """
+        return self.to_dict()['games']
+
+    def to_dict(self) -> dict:
+        """
+        returns the combined collection in the dictionary shape returned by combine_bgg_collections;
+        the result is cached until the next change and must not be mutated
+        """
+        if self._snapshot is None:
+            games = [self.get_game(objectid) for objectid in self._owners]
+            self._snapshot = {
+                "type": "CombinedUserCollection",
+                "owner": self.owners,
+                "games": games,
+                "game_list": sorted(game['name'] for game in games),
+                "game_id_list": sorted(self._owners),
+                "total_games": len(games)
+            }
+        return self._snapshot
@@ -0,0 +1,149 @@
+import json
+import os
+
+from bgg import collections_known, get_bgg_collections
+from bgg.combined import CombinedCollection
+from utils.metrics import logger
+
+
+# where the per guild collection groups are stored
+BGG_GROUPS_PATH = os.getenv("BGG_GROUPS_PATH", "groups.json")
+# used in direct messages and in guilds that have not set up their own group
+DEFAULT_GROUP = "default"
+
+_groups = None
+
+
+class CollectionGroup:
+    """
+    The bgg users whose collections are combined for one guild.
+
+    The combined collection is only built the first time the group is used, and is then kept up to
+    date incrementally: loading the group re-merges only the collections that changed since, and
+    collections themselves come from the cache shared by every group.
+    """
+
+    def __init__(self, key: str, usernames: list = None):
+        self.key = key
+        self.usernames = list(usernames or [])
+        self._combined = None
+
+    @property
+    def combined(self) -> CombinedCollection:
+        if self._combined is None:
+            self._combined = CombinedCollection()
+        return self._combined
+
+    def add_user(self, username: str) -> bool:
+        """
+        :return: False when the user was already in the group
+        """
+        if username in self.usernames:
+            return False
+        self.usernames.append(username)
+        return True
+
+    def remove_user(self, username: str) -> bool:
+        """
+        :return: False when the user was not in the group
+        """
+        if username not in self.usernames:
+            return False
+        self.usernames.remove(username)
+        if self._combined is not None:
+            self._combined.remove_collection(username)
+        return True
+
+    async def load(self) -> tuple:
+        """
+        brings the group's combined collection up to date with its users' collections
+        :return: a tuple of the combined collection and a list of (username, exception) for collections that failed to load
+        """
+        usernames = list(self.usernames)
+        collections, errors = await get_bgg_collections(usernames)
+        for collection in collections:
+            # users removed while their collection was being fetched stay out of the group
+            if collection['owner'] in self.usernames:
+                self.combined.update_collection(collection)
+        return self.combined, [(username, e) for username, e in errors if username in self.usernames]
+
+    def update_collection(self, collection: dict) -> None:
+        """
+        applies a refreshed collection if its owner is in the group and the group has been loaded
+        """
+        if self._combined is not None and collection['owner'] in self.usernames:
+            self._combined.update_collection(collection)
+
+
+def _load_groups() -> dict:
+    groups = {}
+    try:
+        with open(BGG_GROUPS_PATH) as infile:
+            for key, usernames in json.load(infile).items():
+                groups[key] = CollectionGroup(key, usernames)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"could not read collection groups from {BGG_GROUPS_PATH}: {str(e)}")
+
+    if DEFAULT_GROUP not in groups:
+        groups[DEFAULT_GROUP] = CollectionGroup(DEFAULT_GROUP, collections_known)
+    return groups
+
+
+def get_groups() -> dict:
+    """
+    returns every collection group by key, reading them from BGG_GROUPS_PATH on first use
+    """
+    global _groups
+    if _groups is None:
+        _groups = _load_groups()
+    return _groups
+
+
+def get_group_key(guild_id: int = None) -> str:
+    return str(guild_id) if guild_id is not None else DEFAULT_GROUP
+
+
+def get_group(key: str, create: bool = False) -> CollectionGroup:
+    """
+    returns the collection group stored under key, falling back to the default group
+    :param str key: the group key, see get_group_key
+    :param bool create: create a group for key instead of falling back to the default group; it starts
+        with a copy of the default group's users, so it begins as the collection the guild saw before
+    """
+    groups = get_groups()
+    if key not in groups:
+        if not create:
+            return groups[DEFAULT_GROUP]
+        groups[key] = CollectionGroup(key, groups[DEFAULT_GROUP].usernames)
+    return groups[key]
+
+
+def save_groups() -> None:
+    """
+    writes every collection group to BGG_GROUPS_PATH, replacing it atomically
+    """
+    groups_dir = os.path.dirname(BGG_GROUPS_PATH)
+    if groups_dir:
+        os.makedirs(groups_dir, exist_ok=True)
+    tmp_path = f"{BGG_GROUPS_PATH}.tmp"
+    with open(tmp_path, "w") as outfile:
+        json.dump({key: group.usernames for key, group in get_groups().items()}, outfile, indent=2)
+    os.replace(tmp_path, BGG_GROUPS_PATH)
+
+
+def get_all_usernames() -> list:
+    """
+    returns every user in any group, each once
+    """
+    return list(dict.fromkeys(username for group in get_groups().values() for username in group.usernames))
+
+
+def update_collection(collection: dict) -> None:
+    """
+    applies a refreshed collection to every loaded group its owner belongs to
+    :param dict collection: a collection dictionary returned by get_bgg_collection
+    """
+    for group in get_groups().values():
+        group.update_collection(collection)
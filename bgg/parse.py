@@ -0,0 +1,184 @@
+import xml.etree.ElementTree as xml
+
+from utils.text import normalize, normalize_many
+
+
+def parse_game_item(item: xml.Element) -> dict:
+    """
+    builds the game details dictionary from a bgg thing <item> element
+    :param xml.Element item: an item element from a thing?stats=1 response
+    """
+    # create expansions list
+    boardgame_categories = []
+    expansions = [] 
+    for link in item.findall('link'):
+        if link.attrib['type'] == 'boardgameexpansion':
+            expansions.append(
+                {
+                    "objectid": link.attrib['id'],
+                    "label": normalize(link.attrib['value'])
+                }
+            )
+        elif link.attrib['type'] == 'boardgamecategory':
+            boardgame_categories.append(
+                {
+                    "categoryid": link.attrib['id'],
+                    "label": normalize(link.attrib['value'], to_lower=True)
+                }
+            )
+
+    if 2687 in boardgame_categories:
+        object_type = "boardgamefanexpansion"
+    else:    
+        object_type = item.attrib['type']
+
+    # create list of the suggested player counts based on the user poll
+    suggested_numplayers = [] 
+    for poll in item.findall('poll'):
+        if poll.attrib['name'] == 'suggested_numplayers':
+            for result in poll.findall('results'):
+                recommendation = None
+                recommendation_votes = 0
+                for value in result.findall('result'):
+                    if int(value.attrib['numvotes']) > recommendation_votes:
+                        recommendation = value.attrib['value']
+                        recommendation_votes = int(value.attrib['numvotes'])
+
+                suggested_numplayers.append(
+                    {
+                        "numplayers": result.attrib['numplayers'],
+                        "recommendation": recommendation,
+                        "votes": recommendation_votes
+                    }
+                )
+
+    game_details = {
+        "objectid": item.attrib['id'],
+        "type": object_type,
+        "label": normalize(item.find('name').attrib['value']),
+        "name": normalize(item.find('name').attrib['value'], True),
+        "description": normalize(item.find('description').text),
+        "yearpublished": item.find('yearpublished').attrib['value'],
+        "minplayers": item.find('minplayers').attrib['value'],
+        "maxplayers": item.find('maxplayers').attrib['value'],
+        "minplaytime": item.find('minplaytime').attrib['value'],
+        "maxplaytime": item.find('maxplaytime').attrib['value'],
+        "averagerated": str(round(float(item.find('statistics').find('ratings').find('average').attrib['value']), 1)),
+        "usersrated": item.find('statistics').find('ratings').find('usersrated').attrib['value'],
+        "averageweight": item.find('statistics').find('ratings').find('averageweight').attrib['value'],
+        "suggested_numplayers": suggested_numplayers,
+        "categories": boardgame_categories,
+        "expansions": expansions
+    }
+
+    game_details['descriptionshort'] = (game_details['description'][:400] + '...[more]') if len(game_details['description']) > 400 else game_details['description']
+    game_details['playtime'] = f"{game_details['minplaytime']} - {game_details['maxplaytime']}"
+    game_details['playercount'] = f"{game_details['minplayers']} - {game_details['maxplayers']}, Best: {'/'.join([recommendation['numplayers'] for recommendation in game_details['suggested_numplayers'] if recommendation['recommendation'] == 'Best'])}"
+
+    try: 
+        game_details['image'] = item.find('image').text
+        game_details['thumbnail'] = item.find('thumbnail').text
+    except AttributeError: 
+        game_details["image"] = "https://cf.geekdo-images.com/zxVVmggfpHJpmnJY9j-k1w__imagepagezoom/img/RO6wGyH4m4xOJWkgv6OVlf6GbrA=/fit-in/1200x900/filters:no_upscale():strip_icc()/pic1657689.jpg"
+        game_details["thumbnail"] = "https://cf.geekdo-images.com/zxVVmggfpHJpmnJY9j-k1w__imagepagezoom/img/RO6wGyH4m4xOJWkgv6OVlf6GbrA=/fit-in/1200x900/filters:no_upscale():strip_icc()/pic1657689.jpg" 
+
+    return game_details
+
+
+def parse_things_xml(content: bytes) -> list:
+    """
+    parses a thing?stats=1 response into a list of game details
+    :param bytes content: the thing response body
+    """
+    tree = xml.fromstring(content)
+    return [parse_game_item(item) for item in tree.findall('item')]
+
+
+def parse_search_xml(content: bytes) -> list:
+    """
+    parses a search response into a list of search results
+    :param bytes content: the search response body
+    """
+    tree = xml.fromstring(content)
+    items = tree.findall('item')
+    boardgame_names = normalize_many([item.find('name').attrib['value'] for item in items])
+    return [
+        {
+            "objectid": item.attrib['id'],
+            "type": item.attrib['type'],
+            "name": boardgame_name
+        }
+        for item, boardgame_name in zip(items, boardgame_names)
+    ]
+
+
+def parse_collection_item(child: xml.Element, username: str, include_status: bool = False) -> dict:
+    """
+    builds a collection game dictionary from a bgg collection <item> element
+    :param xml.Element child: an item element from a collection response
+    :param str username: the bgg username that owns the collection
+    :param bool include_status: keep the user's status for the game (owned, want to buy, for trade, etc)
+    """
+    game = {}
+    game["owned_by"] = [username]
+    game["type"] = child.attrib["subtype"]
+    game["objectid"] = child.attrib["objectid"]
+    for item in child:
+        if(item.tag == 'status'):
+            if include_status:
+                game[item.tag] = dict(item.attrib)
+        elif(item.tag == 'name'):
+            game['label'] = normalize(item.text)
+            game[item.tag] = normalize(game['label'], True)
+        else:
+            game[item.tag] = item.text
+
+    return game
+
+
+def parse_collection_xml(content: bytes, username: str, include_status: bool = False) -> list:
+    """
+    parses a complete, buffered collection response into a list of games
+    :param bytes content: the collection response body
+    :param str username: the bgg username that owns the collection
+    :param bool include_status: keep the user's status for each game
+    """
+    tree = xml.fromstring(content)
+    return [parse_collection_item(child, username, include_status) for child in tree.findall('item')]
+
+
+class CollectionStreamParser:
+    """
+    Incrementally parses a collection response as it is received.
+
+    Each <item> is turned into a game dictionary as soon as it is complete and then dropped from
+    the element tree, so memory use does not grow with the size of the collection xml.
+    """
+
+    def __init__(self, username: str, include_status: bool = False):
+        self.username = username
+        self.include_status = include_status
+        self.games = []
+        self._parser = xml.XMLPullParser(events=("start", "end"))
+        self._root = None
+
+    def feed(self, chunk: bytes) -> None:
+        self._parser.feed(chunk)
+        self._read_events()
+
+    def close(self) -> list:
+        """
+        finishes parsing and returns the parsed games
+        """
+        self._parser.close()
+        self._read_events()
+        return self.games
+
+    def _read_events(self) -> None:
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = element
+            elif element.tag == "item":
+                self.games.append(parse_collection_item(element, self.username, self.include_status))
+                self._root.remove(element)
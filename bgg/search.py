@@ -0,0 +1,122 @@
+from collections import Counter, defaultdict
+
+
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_WORD_PREFIX = 2
+MATCH_SUBSTRING = 3
+MATCH_FUZZY = 4
+
+FUZZY_MIN_SIMILARITY = 0.3
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _padded_trigrams(text: str) -> set:
+    return _trigrams(f" {text} ")
+
+
+class SearchIndex:
+    """
+    Trigram inverted index over normalized game names.
+
+    Results are ranked exact > prefix > word prefix > substring > fuzzy; fuzzy matches are names
+    sharing enough trigrams with the query. Entries can be added and removed one at a time so the
+    index follows collection refreshes without being rebuilt.
+    """
+
+    def __init__(self):
+        self._names = {}                   # key -> name
+        self._postings = defaultdict(set)  # trigram -> keys
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, key: str, name: str) -> None:
+        """
+        indexes a name, replacing the previous name indexed for the key
+        :param str key: the unique key of the entry, e.g. a bgg object id
+        :param str name: the normalized name to index
+        """
+        if self._names.get(key) == name:
+            return
+        self.remove(key)
+        self._names[key] = name
+        for trigram in _padded_trigrams(name):
+            self._postings[trigram].add(key)
+
+    def remove(self, key: str) -> None:
+        """
+        removes an entry from the index
+        :param str key: the unique key of the entry
+        """
+        name = self._names.pop(key, None)
+        if name is None:
+            return
+        for trigram in _padded_trigrams(name):
+            keys = self._postings[trigram]
+            keys.discard(key)
+            if not keys:
+                del self._postings[trigram]
+
+    def _rank(self, query: str, name: str) -> int:
+        if name == query:
+            return MATCH_EXACT
+        if name.startswith(query):
+            return MATCH_PREFIX
+        if f" {query}" in name:
+            return MATCH_WORD_PREFIX
+        if query in name:
+            return MATCH_SUBSTRING
+        return None
+
+    def search(self, query: str, limit: int = None, fuzzy: bool = True) -> list:
+        """
+        finds the entries matching a query, best matches first
+        :param str query: the normalized search text
+        :param int limit: the maximum number of results to return
+        :param bool fuzzy: include names that only loosely match the query
+        :return: a list of (rank, key) tuples where rank is one of the MATCH_* constants
+        """
+        if not query:
+            return []
+
+        query_trigrams = _trigrams(query)
+        if query_trigrams:
+            # every trigram of the query has to appear in a name that contains it
+            postings = sorted((self._postings.get(trigram, set()) for trigram in query_trigrams), key=len)
+            candidates = set.intersection(*postings) if postings[0] else set()
+        else:
+            # too short to use trigrams; short queries only run against the name list
+            candidates = self._names.keys()
+
+        results = []
+        for key in candidates:
+            name = self._names[key]
+            rank = self._rank(query, name)
+            if rank is not None:
+                results.append((rank, len(name), name, key))
+        results.sort()
+        matched = [(rank, key) for rank, _, _, key in results]
+
+        if fuzzy and (limit is None or len(matched) < limit):
+            matched_keys = {key for _, key in matched}
+            padded_query_trigrams = _padded_trigrams(query)
+            shared_counts = Counter()
+            for trigram in padded_query_trigrams:
+                shared_counts.update(self._postings.get(trigram, ()))
+
+            fuzzy_results = []
+            for key, shared in shared_counts.items():
+                if key in matched_keys:
+                    continue
+                name = self._names[key]
+                similarity = shared / (len(padded_query_trigrams) + len(_padded_trigrams(name)) - shared)
+                if similarity >= FUZZY_MIN_SIMILARITY:
+                    fuzzy_results.append((-similarity, name, key))
+            fuzzy_results.sort()
+            matched.extend((MATCH_FUZZY, key) for _, _, key in fuzzy_results)
+
+        return matched[:limit] if limit is not None else matched
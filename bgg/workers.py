@@ -0,0 +1,53 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+# where xml parsing and normalization run: "inline" on the event loop thread, or in a "thread" or
+# "process" pool so large responses do not stall other discord interactions
+BGG_PARSE_EXECUTOR = os.getenv("BGG_PARSE_EXECUTOR", "inline")
+BGG_PARSE_WORKERS = int(os.getenv("BGG_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+
+_executor = None
+
+
+def get_parse_executor() -> Executor:
+    """
+    Returns the pool parse work is sent to, creating it on first use; None when parsing runs inline
+    """
+    global _executor
+    if BGG_PARSE_EXECUTOR == "inline":
+        return None
+    if _executor is None:
+        if BGG_PARSE_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=BGG_PARSE_WORKERS)
+        elif BGG_PARSE_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=BGG_PARSE_WORKERS, thread_name_prefix="bgg-parse")
+        else:
+            raise ValueError(f"unknown BGG_PARSE_EXECUTOR: {BGG_PARSE_EXECUTOR}")
+    return _executor
+
+
+def parses_in_process() -> bool:
+    """
+    True when parse work runs in other processes, where it can only receive and return picklable data
+    """
+    return BGG_PARSE_EXECUTOR == "process"
+
+
+async def run_parse(func, *args) -> object:
+    """
+    Runs CPU bound parse work in the configured pool and returns its result
+    :param func: a module level function taking and returning plain data when the pool is a process pool
+    """
+    executor = get_parse_executor()
+    if executor is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+def shutdown_parse_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
@@ -1,81 +1,156 @@
+import aiohttp
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import Embed, Color
 from dotenv import load_dotenv
+import asyncio
 import os
-import requests
+
+# load .env before the bgg, cache and metrics modules read their settings from the environment
+load_dotenv()
 
 from bgg import (
     BggCollectionError, 
     BggCollectionTimeoutError, 
+    BggGameNotFoundError,
+    BggRequestError,
     get_bgg_collection, 
+    get_bgg_collections,
     get_game_details,
     get_game_from_collection,
     search_bgg,
-    combine_bgg_collections,
-    collections_known
+    warm_caches,
+    get_coalesce_stats
 )
+from bgg.client import close_http_session
+from bgg import groups
+from bgg.combined import CombinedCollection
+from bgg.search import MATCH_FUZZY
+from bgg.workers import shutdown_parse_executor
+from cache import get_cache_stats
+from catalog import close_catalog, get_catalog_stats, run_catalog, search_catalog
 
-from utils.text import normalize
+from utils.metrics import METRICS_EXPORT_PATH, configure_logging, export_metrics, get_metrics, logger, monitor_event_loop_lag
+from utils.pagination import PAGE_SIZE, get_page_count, join_lines, send_pages
+from utils.text import get_normalize_stats, normalize
 
 intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix='/', intents=intents)
 
-known_users = collections_known
+COLLECTION_SEARCH_LIMIT = 10
+CACHE_WARM_INTERVAL = float(os.getenv("BGG_CACHE_WARM_INTERVAL", 30))
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", 60))
+loop_lag_monitor = None
+
+
+@tasks.loop(minutes=CACHE_WARM_INTERVAL)
+async def warm_known_caches():
+    for user_collection in await warm_caches(groups.get_all_usernames()):
+        groups.update_collection(user_collection)
+
+
+async def get_stats() -> dict:
+    return {
+        **get_metrics(),
+        "memory_cache": get_cache_stats(),
+        "normalize_cache": get_normalize_stats(),
+        "coalescing": get_coalesce_stats(),
+        "catalog": await run_catalog(get_catalog_stats)
+    }
+
+
+@tasks.loop(seconds=METRICS_EXPORT_INTERVAL)
+async def export_stats():
+    stats = await get_stats()
+    export_metrics(METRICS_EXPORT_PATH, extra={key: value for key, value in stats.items() if key not in ("histograms", "counters")})
+
+
+@bot.event
+async def on_ready():
+    if not warm_known_caches.is_running():
+        warm_known_caches.start()
+    if METRICS_EXPORT_PATH and not export_stats.is_running():
+        export_stats.start()
+    global loop_lag_monitor
+    if loop_lag_monitor is None:
+        loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+
 
 @bot.command()
 async def ping(ctx):
     await ctx.send("pong bitch")
 
 
+def describe_collection_error(user: str, e: Exception) -> str:
+    # connection errors and timeouts from the http client may not carry a message
+    return str(e) or f"{user}'s collection could not be retrieved from BGG ({type(e).__name__})"
+
+
+def get_group(ctx) -> groups.CollectionGroup:
+    return groups.get_group(groups.get_group_key(ctx.guild.id if ctx.guild else None))
+
+
+async def load_combined_collection(ctx) -> CombinedCollection:
+    # only the collections of this guild's group are loaded; they come from the cache shared by every group
+    combined_collection, errors = await get_group(ctx).load()
+    for user, e in errors:
+        await ctx.send(f"{describe_collection_error(user, e)}; creating partial combined collection")
+    return combined_collection
+
+
+def format_game_line(game: dict) -> str:
+    return f"[{game['label']}](https://boardgamegeek.com/boardgame/{game['objectid']}) ({game.get('yearpublished') or '?'})"
+
+
 @bot.command()
 async def game(ctx, *, game_name):
     game_name = normalize(game_name, True)
 
-    collections = []
-    for user in known_users:
-        try: 
-            collections.append(await get_bgg_collection(user))
-        except BggCollectionTimeoutError as e: 
-            await ctx.send(f"{str(e)}; creating partial combined collection")
-        except BggCollectionError as e: 
-            await ctx.send(f"{str(e)}; creating partial combined collection")
-
-    combined_collection = await combine_bgg_collections(collections)
-    collection_search_results = [collection_game for collection_game in combined_collection['games'] if game_name in collection_game['name']]
+    combined_collection = await load_combined_collection(ctx)
+    collection_matches = combined_collection.search(game_name, limit=COLLECTION_SEARCH_LIMIT)
+    collection_search_results = [collection_game for rank, collection_game in collection_matches]
 
     game_in_collection = False
     game_description = "No game was found in the collections of the known users using the provided search. The best match has been provided via BGG search."
     game_owners = f"```No one currently owns this game```"
 
-    if len(collection_search_results) > 0:
-        game_in_collection = True
-        game_description = None
-        print("game in collection")
-        found_game = collection_search_results[0]
-        game_owners = f"```{', '.join(found_game['owned_by'])}```"
-        game_details = await get_game_details(found_game['objectid'])
-    else:
-        print("game not in collection")
-        search_results = await search_bgg(game_name)
-        boardgame_names = []
-
-        if len(search_results) < 1:
-            return await ctx.send(f"No game found using the provided search criteria: `{game_name}`")
-        elif len(search_results) == 1:
-            preferred_game_id = search_results[0]['objectid']
+    try:
+        # fuzzy matches are only offered as other matches; they fall back to a bgg search for the best match
+        if len(collection_matches) > 0 and collection_matches[0][0] != MATCH_FUZZY:
+            game_in_collection = True
+            game_description = None
+            logger.debug("game in collection")
+            found_game = collection_search_results[0]
+            game_owners = f"```{', '.join(found_game['owned_by'])}```"
+            game_details = await get_game_details(found_game['objectid'])
         else:
-            boardgame_game_ids = [int(search_result['objectid']) for search_result in search_results]
-            preferred_game_id = boardgame_game_ids[int(len(boardgame_game_ids)/2)]
-            
+            logger.debug("game not in collection")
+            boardgame_names = []
+            # the local catalog ranks its results, so its best match comes first; bgg is only asked on a miss
+            search_results = await run_catalog(search_catalog, game_name)
+            if len(search_results) > 0:
+                logger.debug("game found in catalog")
+                preferred_game_id = search_results[0]['objectid']
+            else:
+                search_results = await search_bgg(game_name)
+                if len(search_results) < 1:
+                    return await ctx.send(f"No game found using the provided search criteria: `{game_name}`")
+                elif len(search_results) == 1:
+                    preferred_game_id = search_results[0]['objectid']
+                else:
+                    boardgame_game_ids = [search_result['objectid'] for search_result in search_results]
+                    preferred_game_id = boardgame_game_ids[int(len(boardgame_game_ids)/2)]
+
             for search_result in search_results:
-                if int(search_result['objectid']) != preferred_game_id:
-                    boardgame_game_names.append(search_result['name'])
+                if search_result['objectid'] != preferred_game_id:
+                    boardgame_names.append(search_result['name'])
 
 
-        game_details = await get_game_details(preferred_game_id)
-        num_games_to_return = 10
+            game_details = await get_game_details(preferred_game_id)
+            num_games_to_return = 10
+    except (BggRequestError, BggGameNotFoundError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return await ctx.send(f"Could not look up `{game_name}` on BGG: {str(e) or type(e).__name__}")
 
 
     embed = Embed(
@@ -118,36 +193,83 @@ async def game(ctx, *, game_name):
 async def refresh_collection(ctx, *, username):
     username = normalize(username, True)
     await ctx.send(f"refreshing {username}'s collection cache")
-    delete_cache("collection", username)
-    user_collection = await get_bgg_collection(username)
+    # a full fetch, so games removed from the collection on bgg are dropped as well
+    user_collection = await get_bgg_collection(username, refresh=True, full=True)
+    groups.update_collection(user_collection)
     await ctx.send(f"{username}'s collection cache updated: {len(user_collection['game_id_list'])} games")
 
 
 @bot.command()
-async def collection(ctx, username):
-    collection = await get_bgg_collection(username)
-    collection_formatted = f"""```json {json.dumps(collection["games"][0])}```"""
-    for game in collection['games']:
-        await ctx.send(game['thumbnail'])
+async def collection(ctx, username, page: int = 1):
+    username = normalize(username, True)
+    try:
+        user_collection = await get_bgg_collection(username)
+    except (BggCollectionError, BggCollectionTimeoutError) as e:
+        return await ctx.send(str(e))
+
+    # order an index of the games rather than the games themselves; the collection may be shared from the cache
+    games = user_collection['games']
+    order = sorted(range(len(games)), key=lambda index: games[index]['name'])
+    page_count = get_page_count(len(order))
+
+    def render_page(page: int) -> Embed:
+        page_games = [games[index] for index in order[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]]
+        embed = Embed(
+            title=f"{username}'s Collection ({len(games)} Games)",
+            url=f"https://boardgamegeek.com/collection/user/{username}",
+            description=join_lines([format_game_line(page_game) for page_game in page_games]) or "*No games in this collection*",
+            colour=discord.Color.dark_purple(),
+        )
+        if page_games and page_games[0].get('thumbnail'):
+            embed.set_thumbnail(url=page_games[0]['thumbnail'])
+        embed.set_footer(text=f"Page {page + 1} of {page_count}")
+        return embed
+
+    await send_pages(ctx, render_page, page_count, page - 1)
+
+
+@bot.command()
+async def combined(ctx, page: int = 1):
+    combined_collection = await load_combined_collection(ctx)
+    # a snapshot of the sizes, so every page of this listing reports the same totals
+    total_games = len(combined_collection)
+    owners = combined_collection.owners
+    page_count = get_page_count(total_games)
+
+    def render_page(page: int) -> Embed:
+        page_games = combined_collection.list_games(page * PAGE_SIZE, PAGE_SIZE)
+        embed = Embed(
+            title=f"Combined Collection ({total_games} Games)",
+            description=join_lines([f"{format_game_line(page_game)} - {', '.join(page_game['owned_by'])}" for page_game in page_games]) or "*No games in the combined collection*",
+            colour=discord.Color.dark_purple(),
+        )
+        embed.set_footer(text=f"Page {page + 1} of {page_count} | {', '.join(owners)}"[:2048])
+        return embed
+
+    await send_pages(ctx, render_page, page_count, page - 1)
 
 
 @bot.command()
 async def known_collections(ctx):
     # TODO: Add link to bgg user collection https://boardgamegeek.com/collection/user/<username>
     kc = []
-    for user in known_users:
+    user_collections, errors = await get_bgg_collections(get_group(ctx).usernames)
+    for user, e in errors:
+        await ctx.send(f"{describe_collection_error(user, e)}; listing partial known collections")
+
+    for user_collection in user_collections:
+        user = user_collection['owner']
         crown = ""
         # TODO: find actual top game count and assign crown
         if user.lower() == "jchamilton":
             crown = ":crown:"
 
         user_link = f"[{user}](https://boardgamegeek.com/collection/user/{user})"
-        user_collection = await get_bgg_collection(user)
         user_collection_size = len(user_collection['games'])
 
         kc.append(f"{user_link} ({user_collection_size} Games) {crown}")
 
-    kc = "\n".join(kc)
+    kc = "\n".join(kc) or "*No collections yet, add one with /add_collection <bgg username>*"
 
     embed = Embed(
         title="Known Collections",
@@ -156,8 +278,92 @@ async def known_collections(ctx):
     embed.add_field(name=f"""Currently I know the board game collections of:""", value=kc)
     await ctx.send(embed=embed)
 
+@bot.command()
+async def add_collection(ctx, username):
+    if ctx.guild is None:
+        return await ctx.send("Collection groups can only be changed in a server")
+    username = normalize(username, True)
+    try:
+        user_collection = await get_bgg_collection(username)
+    except (BggCollectionError, BggCollectionTimeoutError) as e:
+        return await ctx.send(str(e))
+
+    group_key = groups.get_group_key(ctx.guild.id)
+    if username in groups.get_group(group_key).usernames:
+        return await ctx.send(f"{username}'s collection is already known in this server")
+    # the first change in a server gives it its own group, starting from the default group's users
+    new_group = group_key not in groups.get_groups()
+    group = groups.get_group(group_key, create=True)
+    group.add_user(username)
+    groups.save_groups()
+    group.update_collection(user_collection)
+    if new_group:
+        await ctx.send("started this server's own collection group from the default one")
+    await ctx.send(f"added {username}'s collection ({len(user_collection['games'])} games)")
+
+
+@bot.command()
+async def remove_collection(ctx, username):
+    if ctx.guild is None:
+        return await ctx.send("Collection groups can only be changed in a server")
+    username = normalize(username, True)
+    group_key = groups.get_group_key(ctx.guild.id)
+    if username not in groups.get_group(group_key).usernames:
+        return await ctx.send(f"{username}'s collection is not known in this server")
+    new_group = group_key not in groups.get_groups()
+    groups.get_group(group_key, create=True).remove_user(username)
+    groups.save_groups()
+    if new_group:
+        await ctx.send("started this server's own collection group from the default one")
+    await ctx.send(f"removed {username}'s collection")
+
+
+@bot.command()
+async def stats(ctx):
+    stats = await get_stats()
+    counters = stats["counters"]
+    memory_cache = stats["memory_cache"]
+    normalize_cache = stats["normalize_cache"]
+    coalescing = stats["coalescing"]
+
+    stages = "\n".join(
+        f"{stage[:24]:<24} {histogram['count']:>6} {histogram['p50_ms']:>7} {histogram['p99_ms']:>7}"
+        for stage, histogram in stats["histograms"].items()
+    )
+    statuses = ", ".join(f"{counter.split('.', 1)[1]}: {count}" for counter, count in counters.items() if counter.startswith("bgg_status."))
+    cache_hits = "\n".join(
+        f"{cache_type}: {counters.get(f'cache.{cache_type}.memory_hits', 0)} memory / "
+        f"{counters.get(f'cache.{cache_type}.disk_hits', 0)} disk / "
+        f"{counters.get(f'cache.{cache_type}.misses', 0)} miss / "
+        f"{counters.get(f'cache.{cache_type}.stale_served', 0)} stale"
+        for cache_type in ("collection", "game")
+    )
+
+    embed = Embed(
+        title="Bot Stats",
+        colour=discord.Color.dark_purple(),
+    )
+    embed.add_field(name="Stage timings (count, p50 ms, p99 ms)", value=f"```{stages or 'nothing timed yet'}```"[:1024], inline=False)
+    embed.add_field(name="Cache lookups", value=cache_hits, inline=False)
+    embed.add_field(name="Memory cache", value=f"{memory_cache['hit_ratio']:.0%} hit ratio, {memory_cache['entries']}/{memory_cache['max_entries']} entries", inline=True)
+    embed.add_field(name="Name normalization", value=f"{normalize_cache['hits']} memo hits / {normalize_cache['misses']} misses", inline=True)
+    embed.add_field(name="BGG responses", value=statuses or "no requests yet", inline=False)
+    embed.add_field(name="BGG requests", value=f"{coalescing['fetches']} fetched, {coalescing['coalesced']} coalesced, {counters.get('bgg_retries', 0)} retried", inline=False)
+    if stats["catalog"]["enabled"]:
+        embed.add_field(name="Game catalog", value=f"{stats['catalog']['games']} games, {counters.get('catalog.hits', 0)} hits / {counters.get('catalog.misses', 0)} misses", inline=False)
+    await ctx.send(embed=embed)
+
 # TODO: hot list command
-# TODO: list all games in combined collection command
 
-load_dotenv()
-bot.run(os.getenv('BOT_TOKEN', None))
+async def main():
+    async with bot:
+        try:
+            await bot.start(os.getenv('BOT_TOKEN', None))
+        finally:
+            await close_http_session()
+            shutdown_parse_executor()
+            close_catalog()
+
+if __name__ == "__main__":
+    configure_logging(os.getenv("LOG_LEVEL", "INFO"))
+    asyncio.run(main())
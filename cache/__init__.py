@@ -1,79 +1,284 @@
 import os
-import json
+import time
+from collections import OrderedDict
 from datetime import datetime
 
+from cache import formats
+from utils.metrics import increment, logger, timed
 
+
+CACHE_ROOT = os.getenv("BGG_CACHE_DIR", "cache")
 CACHE_DATETIME_FMT = "%Y-%m-%d-%H-%M-%S"
+CACHE_FILE_SUFFIX = ".cache.json"
+# serialization per cache type: "json" (plain), "columnar" (compact json) or "msgpack" (compact binary);
+# files in any format stay readable, so changing the format migrates entries as they are rewritten
+CACHE_FORMATS = {
+    "collection": os.getenv("BGG_CACHE_FORMAT_COLLECTION", "columnar"),
+    "game": os.getenv("BGG_CACHE_FORMAT_GAME", "json")
+}
+CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("BGG_CACHE_MEMORY_MAX_ENTRIES", 512))
 
+_prepared_cache_types = set()
 
-def get_cache_age(cache_file: str) -> float:
+# in-process tier in front of the file cache: (cache_type, cache_name) -> (written_at, content)
+# content is shared between callers and must be treated as read-only
+_memory_cache = OrderedDict()
+_memory_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _memory_get(cache_type: str, cache_name: str, cache_age_max: float) -> tuple:
+    key = (cache_type, str(cache_name))
+    entry = _memory_cache.get(key)
+    if entry is None:
+        _memory_cache_stats["misses"] += 1
+        return None
+
+    written_at, content = entry
+    if time.time() - written_at > (cache_age_max * 60 * 60):
+        del _memory_cache[key]
+        _memory_cache_stats["misses"] += 1
+        return None
+
+    _memory_cache.move_to_end(key)
+    _memory_cache_stats["hits"] += 1
+    return entry
+
+
+def _memory_set(cache_type: str, cache_name: str, content: object, written_at: float) -> None:
+    key = (cache_type, str(cache_name))
+    _memory_cache[key] = (written_at, content)
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > CACHE_MEMORY_MAX_ENTRIES:
+        _memory_cache.popitem(last=False)
+        _memory_cache_stats["evictions"] += 1
+
+
+def _memory_delete(cache_type: str, cache_name: str) -> None:
+    _memory_cache.pop((cache_type, str(cache_name)), None)
+
+
+def get_cache_stats() -> dict:
     """
-    Retrieves a cache file based on type and name
-    :param str cache_type: "collection" | "game" 
+    Returns hit/miss/eviction counters for the in-memory cache tier
+    """
+    lookups = _memory_cache_stats["hits"] + _memory_cache_stats["misses"]
+    return {
+        **_memory_cache_stats,
+        "entries": len(_memory_cache),
+        "max_entries": CACHE_MEMORY_MAX_ENTRIES,
+        "hit_ratio": (_memory_cache_stats["hits"] / lookups) if lookups else 0.0
+    }
+
+
+def get_cache_format(cache_type: str) -> str:
+    """
+    Returns the format new cache files of a type are written in
+    :param str cache_type: "collection" | "game"
+    """
+    cache_format = CACHE_FORMATS.get(cache_type, "json")
+    if cache_format == "msgpack" and formats.msgpack is None:
+        logger.warning("msgpack is not installed, writing columnar json caches instead")
+        CACHE_FORMATS[cache_type] = cache_format = "columnar"
+    return cache_format
+
+
+def get_cache_path(cache_type: str, cache_name: str, cache_format: str = None) -> str:
+    """
+    Returns the deterministic path of a cache file based on type and unique name
+    :param str cache_type: "collection" | "game"
     :param str cache_name: unique name of the case
-    :param int cache_age_max: the maximum acceptable age for a cache in hours
+    :param str cache_format: the format of the file; defaults to the format configured for the type
+    """
+    safe_cache_name = str(cache_name).replace("/", "_").replace(os.sep, "_")
+    cache_suffix = formats.CACHE_FILE_SUFFIXES[cache_format or get_cache_format(cache_type)]
+    return os.path.join(CACHE_ROOT, cache_type, f"{cache_type}_{safe_cache_name}{cache_suffix}")
+
+
+def _get_cache_paths(cache_type: str, cache_name: str) -> list:
+    """
+    Returns every path a cache entry may be stored at, the configured format first
+    """
+    cache_format = get_cache_format(cache_type)
+    cache_paths = [get_cache_path(cache_type, cache_name, cache_format)]
+    for other_format in formats.CACHE_FILE_SUFFIXES:
+        cache_path = get_cache_path(cache_type, cache_name, other_format)
+        if cache_path not in cache_paths and (other_format != "msgpack" or formats.msgpack is not None):
+            cache_paths.append(cache_path)
+    return cache_paths
+
+
+def _find_cache_file(cache_type: str, cache_name: str) -> tuple:
+    """
+    Returns (path, modified time) of the file holding a cache entry, or None when there is none
     """
-    cache_time = datetime.strptime(cache_file.split("_")[2].split(".")[0], CACHE_DATETIME_FMT)
-    cache_age = (datetime.now() - cache_time).total_seconds()
-    return cache_age
+    for cache_path in _get_cache_paths(cache_type, cache_name):
+        try:
+            return cache_path, os.path.getmtime(cache_path)
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def get_cache_age(cache_file: str) -> float:
+    """
+    Returns the age of a cache file in seconds, based on when it was last written
+    :param str cache_file: path to the cache file
+    """
+    return time.time() - os.path.getmtime(cache_file)
+
+
+def _migrate_legacy_cache(cache_type: str) -> None:
+    """
+    Converts timestamped cache files (<type>_<name>_<timestamp>.cache.json) left by older versions
+    into the deterministic per-key layout; the newest file per key is kept and the rest are removed
+    :param str cache_type: "collection" | "game"
+    """
+    cache_dir_path = os.path.join(CACHE_ROOT, cache_type)
+    prefix = f"{cache_type}_"
+    legacy_files = {}
+    for file in os.listdir(cache_dir_path):
+        if not (file.startswith(prefix) and file.endswith(CACHE_FILE_SUFFIX)):
+            continue
+        cache_name, _, timestamp = file[len(prefix):-len(CACHE_FILE_SUFFIX)].rpartition("_")
+        try:
+            cache_time = datetime.strptime(timestamp, CACHE_DATETIME_FMT)
+        except ValueError:
+            continue
+        legacy_files.setdefault(cache_name, []).append((cache_time, file))
+
+    for cache_name, files in legacy_files.items():
+        files.sort()
+        newest_time, newest_file = files.pop()
+        for _, file in files:
+            os.remove(os.path.join(cache_dir_path, file))
+
+        cache_path = get_cache_path(cache_type, cache_name, "json")
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= newest_time.timestamp():
+            os.remove(os.path.join(cache_dir_path, newest_file))
+        else:
+            os.replace(os.path.join(cache_dir_path, newest_file), cache_path)
+            os.utime(cache_path, (newest_time.timestamp(), newest_time.timestamp()))
+
+
+def _prepare_cache_dir(cache_type: str) -> None:
+    """
+    Creates the cache directory for a type and migrates legacy files; only runs once per type per process
+    :param str cache_type: "collection" | "game"
+    """
+    if cache_type in _prepared_cache_types:
+        return
+    os.makedirs(os.path.join(CACHE_ROOT, cache_type), exist_ok=True)
+    _migrate_legacy_cache(cache_type)
+    _prepared_cache_types.add(cache_type)
 
 
 def delete_cache(cache_type: str, cache_name: str) -> None:
     """
     Deletes a cache file based on type and unique name
-    :param str cache_type: "collection" | "game" 
+    :param str cache_type: "collection" | "game"
     :param str cache_name: unique name of the case
     """
-    cache_dir_path = f"cache/{cache_type}"
-    cache_filename_prefix = f"{cache_type}_{cache_name}_"
-    cache_filename = None
-    for file in os.listdir(cache_dir_path):
-        if file.startswith(cache_filename_prefix):
-            cache_filename = file
-    
-    if cache_filename is not None:
-        print("delete cache")
-        os.remove(f"{cache_dir_path}/{cache_filename}")
+    _memory_delete(cache_type, cache_name)
+    _prepare_cache_dir(cache_type)
+    for cache_path in _get_cache_paths(cache_type, cache_name):
+        try:
+            os.remove(cache_path)
+            logger.debug(f"deleted {cache_type} cache for {cache_name}")
+        except FileNotFoundError:
+            pass
 
 
-def get_cache(cache_type: str, cache_name: str, cache_age_max: int=6) -> None:
+def get_cache_entry_age(cache_type: str, cache_name: str) -> float:
     """
-    Retrieves a cache file based on type and name
-    :param str cache_type: "collection" | "game" 
+    Returns the age of a cache entry in seconds, or None when there is no entry
+    :param str cache_type: "collection" | "game"
     :param str cache_name: unique name of the case
-    :param int cache_age_max: the maximum acceptable age for a cache in hours
     """
-    cache_dir_path = f"cache/{cache_type}"
-    if not os.path.exists(cache_dir_path):
-        os.mkdir(cache_dir_path)
-        
-    cache_filename_prefix = f"{cache_type}_{cache_name}_"
-    cache_filename = None
-    for file in os.listdir(cache_dir_path):
-        if file.startswith(cache_filename_prefix):
-            cache_filename = file
-    
-    if cache_filename is None:
-        return None 
-    elif get_cache_age(cache_filename) > (cache_age_max * 60 * 60):
-        print("delete stale cache")
-        delete_cache(cache_type, cache_name)
+    entry = _memory_cache.get((cache_type, str(cache_name)))
+    if entry is not None:
+        return time.time() - entry[0]
+    _prepare_cache_dir(cache_type)
+    cache_file = _find_cache_file(cache_type, cache_name)
+    if cache_file is None:
         return None
+    return time.time() - cache_file[1]
+
+
+def get_cache(cache_type: str, cache_name: str, cache_age_max: int=6, revalidate=None, cache_stale_max: int=None, keep_expired: bool=False) -> None:
+    """
+    Retrieves a cache entry based on type and name, from memory when possible and otherwise from its file;
+    the returned content is shared with other callers and must not be mutated
+    :param str cache_type: "collection" | "game"
+    :param str cache_name: unique name of the case
+    :param int cache_age_max: the maximum acceptable age for a cache in hours
+    :param revalidate: enables stale-while-revalidate; an expired entry is returned instead of deleted
+        and revalidate() is called so the caller can refresh it in the background
+    :param int cache_stale_max: with revalidate, the maximum age in hours of an expired entry that is
+        still returned; defaults to no limit
+    :param bool keep_expired: leave the file of an entry too old to return in place instead of deleting it,
+        for a refresh that builds on the previous content
+    """
+    if revalidate is None:
+        serve_age_max = cache_age_max
+    else:
+        serve_age_max = float("inf") if cache_stale_max is None else max(cache_age_max, cache_stale_max)
+
+    entry = _memory_get(cache_type, cache_name, serve_age_max)
+    if entry is not None:
+        written_at, content = entry
+        increment(f"cache.{cache_type}.memory_hits")
     else:
-        print("get cache content")
-        with open(f"{cache_dir_path}/{cache_filename}") as cache_file: 
-            return json.load(cache_file)
+        _prepare_cache_dir(cache_type)
+        cache_file = _find_cache_file(cache_type, cache_name)
+        if cache_file is None:
+            increment(f"cache.{cache_type}.misses")
+            return None
+        cache_path, written_at = cache_file
+
+        if time.time() - written_at > (serve_age_max * 60 * 60):
+            increment(f"cache.{cache_type}.misses")
+            if not keep_expired:
+                logger.debug(f"deleting expired {cache_type} cache for {cache_name}")
+                delete_cache(cache_type, cache_name)
+            return None
+
+        try:
+            with timed(f"cache_read.{cache_type}"):
+                with open(cache_path, "rb") as cache_file:
+                    content = formats.loads(cache_file.read(), cache_path[cache_path.rindex(".cache."):])
+        except FileNotFoundError:
+            increment(f"cache.{cache_type}.misses")
+            return None
+        increment(f"cache.{cache_type}.disk_hits")
+        _memory_set(cache_type, cache_name, content, written_at)
+
+    if time.time() - written_at > (cache_age_max * 60 * 60):
+        logger.info(f"serving stale {cache_type} cache for {cache_name} while it is refreshed")
+        increment(f"cache.{cache_type}.stale_served")
+        revalidate()
+    return content
 
 
 def create_cache(cache_type: str, cache_name: str, content: object) -> None:
     """
-    Creates a cache file based on type and unique name
-    :param str cache_type: "collection" | "game" 
+    Creates a cache file based on type and unique name, replacing any existing cache for it
+    :param str cache_type: "collection" | "game"
     :param str cache_name: unique name of the case
-    :param str content: the content to write to cache; is converted to json
+    :param str content: the content to write to cache; is serialized in the format configured for the type
     """
-    print(f"Creating {cache_type} cache for {cache_name}")
-    timestamp = datetime.now().strftime(CACHE_DATETIME_FMT)
-    cache_dir_path = f"cache/{cache_type}"
-    with open(f"{cache_dir_path}/{cache_type}_{cache_name}_{timestamp}.cache.json", "w") as outfile:
-        outfile.write(json.dumps(content))
+    logger.debug(f"creating {cache_type} cache for {cache_name}")
+    _prepare_cache_dir(cache_type)
+    cache_paths = _get_cache_paths(cache_type, cache_name)
+    cache_path = cache_paths[0]
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with timed(f"cache_write.{cache_type}"):
+        with open(tmp_path, "wb") as outfile:
+            outfile.write(formats.dumps(content, get_cache_format(cache_type)))
+        os.replace(tmp_path, cache_path)
+    # drop copies of the entry left in other formats
+    for other_cache_path in cache_paths[1:]:
+        try:
+            os.remove(other_cache_path)
+        except FileNotFoundError:
+            pass
+    _memory_set(cache_type, cache_name, content, os.path.getmtime(cache_path))
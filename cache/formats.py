@@ -0,0 +1,152 @@
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+CACHE_FILE_SUFFIXES = {
+    "json": ".cache.json",
+    "columnar": ".cache.json",
+    "msgpack": ".cache.msgpack"
+}
+
+LAYOUT_KEY = "__cache_layout__"
+COLUMNAR_LAYOUT = "columnar-v1"
+
+# collection fields that only repeat a field of every game and are rebuilt on load
+DERIVED_GAME_FIELDS = {
+    "game_list": "name",
+    "game_id_list": "objectid"
+}
+
+
+def _intern_key(value: object) -> object:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return tuple(value)
+    return None
+
+
+def _encode_column(values: list) -> dict:
+    """
+    stores a column of values, dictionary encoding it when its values repeat
+    """
+    codes = []
+    interned = {}
+    for value in values:
+        key = _intern_key(value)
+        if key is None:
+            return {"values": values}
+        codes.append(interned.setdefault(key, len(interned)))
+
+    if len(interned) * 2 > len(values):
+        return {"values": values}
+    return {"dictionary": [list(key) if isinstance(key, tuple) else key for key in interned], "codes": codes}
+
+
+def _decode_column(column: dict) -> list:
+    if "values" in column:
+        return column["values"]
+    dictionary = column["dictionary"]
+    return [dictionary[code] for code in column["codes"]]
+
+
+def to_columnar(content: object) -> object:
+    """
+    converts a collection dictionary into a columnar layout: one column per game field, repeating
+    strings stored once, and derived lists dropped; any other content is returned unchanged
+    :param object content: the content to encode
+    """
+    if not (isinstance(content, dict) and isinstance(content.get("games"), list)):
+        return content
+
+    games = content["games"]
+    fields = {}
+    derived = []
+    for key, value in content.items():
+        if key == "games":
+            continue
+        game_field = DERIVED_GAME_FIELDS.get(key)
+        if game_field is not None and value == [game.get(game_field) for game in games]:
+            derived.append(key)
+        else:
+            fields[key] = value
+
+    column_names = list(dict.fromkeys(key for game in games for key in game))
+    columns = {}
+    missing = {}
+    for name in column_names:
+        values = []
+        missing_rows = []
+        for row, game in enumerate(games):
+            if name in game:
+                values.append(game[name])
+            else:
+                missing_rows.append(row)
+        columns[name] = _encode_column(values)
+        if missing_rows:
+            missing[name] = missing_rows
+
+    return {
+        LAYOUT_KEY: COLUMNAR_LAYOUT,
+        "fields": fields,
+        "derived": derived,
+        "total_rows": len(games),
+        "columns": columns,
+        "missing": missing
+    }
+
+
+def from_columnar(content: object) -> object:
+    """
+    restores content encoded with to_columnar; content in any other layout is returned unchanged
+    :param object content: the decoded cache file content
+    """
+    if not (isinstance(content, dict) and content.get(LAYOUT_KEY) == COLUMNAR_LAYOUT):
+        return content
+
+    games = [{} for _ in range(content["total_rows"])]
+    for name, column in content["columns"].items():
+        missing_rows = set(content["missing"].get(name, ()))
+        values = iter(_decode_column(column))
+        for row, game in enumerate(games):
+            if row not in missing_rows:
+                value = next(values)
+                # dictionary encoded lists are shared between rows, so give every game its own copy
+                game[name] = list(value) if isinstance(value, list) else value
+
+    decoded = dict(content["fields"])
+    decoded["games"] = games
+    for key in content["derived"]:
+        game_field = DERIVED_GAME_FIELDS[key]
+        decoded[key] = [game.get(game_field) for game in games]
+    return decoded
+
+
+def dumps(content: object, cache_format: str) -> bytes:
+    """
+    serializes cache content
+    :param object content: the content to serialize
+    :param str cache_format: "json" | "columnar" | "msgpack"
+    """
+    if cache_format == "json":
+        return json.dumps(content).encode("utf-8")
+    elif cache_format == "columnar":
+        return json.dumps(to_columnar(content), separators=(",", ":")).encode("utf-8")
+    elif cache_format == "msgpack":
+        return msgpack.packb(to_columnar(content), use_bin_type=True)
+    raise ValueError(f"unknown cache format: {cache_format}")
+
+
+def loads(data: bytes, cache_suffix: str) -> object:
+    """
+    deserializes cache content written by dumps in any format
+    :param bytes data: the cache file content
+    :param str cache_suffix: the suffix of the cache file, which identifies its encoding
+    """
+    if cache_suffix == CACHE_FILE_SUFFIXES["msgpack"]:
+        return from_columnar(msgpack.unpackb(data, raw=False, strict_map_key=False))
+    return from_columnar(json.loads(data))
@@ -0,0 +1,275 @@
+import asyncio
+import csv
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import increment, logger, timed
+from utils.text import normalize
+
+
+# the sqlite file of the local game catalog; the catalog is disabled when this is not set
+BGG_CATALOG_PATH = os.getenv("BGG_CATALOG_PATH")
+CATALOG_SEARCH_LIMIT = 25
+CATALOG_IMPORT_BATCH_SIZE = 5000
+
+_connection = None
+_has_fts = False
+_executor = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    objectid INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    label TEXT NOT NULL,
+    type TEXT NOT NULL DEFAULT 'boardgame',
+    yearpublished TEXT,
+    usersrated INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_name ON games (name);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# keeps the full text index in step with the games table
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5 (name, content='games', content_rowid='objectid');
+CREATE TRIGGER IF NOT EXISTS games_fts_insert AFTER INSERT ON games BEGIN
+    INSERT INTO games_fts (rowid, name) VALUES (new.objectid, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS games_fts_delete AFTER DELETE ON games BEGIN
+    INSERT INTO games_fts (games_fts, rowid, name) VALUES ('delete', old.objectid, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS games_fts_update AFTER UPDATE ON games BEGIN
+    INSERT INTO games_fts (games_fts, rowid, name) VALUES ('delete', old.objectid, old.name);
+    INSERT INTO games_fts (rowid, name) VALUES (new.objectid, new.name);
+END;
+"""
+
+# known games keep their popularity and year when an update, e.g. from a collection, does not include them
+_UPSERT = """
+INSERT INTO games (objectid, name, label, type, yearpublished, usersrated, updated_at)
+VALUES (:objectid, :name, :label, :type, :yearpublished, :usersrated, :updated_at)
+ON CONFLICT (objectid) DO UPDATE SET
+    name = excluded.name,
+    label = excluded.label,
+    type = excluded.type,
+    yearpublished = COALESCE(excluded.yearpublished, games.yearpublished),
+    usersrated = COALESCE(excluded.usersrated, games.usersrated),
+    updated_at = excluded.updated_at
+"""
+
+
+def get_catalog() -> sqlite3.Connection:
+    """
+    Opens the catalog database on first use, creating its tables; None when the catalog is disabled
+    """
+    global _connection, _has_fts
+    if BGG_CATALOG_PATH is None:
+        return None
+    if _connection is None:
+        catalog_dir = os.path.dirname(BGG_CATALOG_PATH)
+        if catalog_dir:
+            os.makedirs(catalog_dir, exist_ok=True)
+        # the bot only uses the connection from the catalog thread, see run_catalog
+        connection = sqlite3.connect(BGG_CATALOG_PATH, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        try:
+            connection.executescript(_FTS_SCHEMA)
+            _has_fts = True
+        except sqlite3.OperationalError:
+            logger.warning("sqlite was built without fts5; the game catalog falls back to LIKE searches")
+            _has_fts = False
+        _connection = connection
+    return _connection
+
+
+async def run_catalog(func, *args) -> object:
+    """
+    Runs catalog work, e.g. add_games or search_catalog, on the catalog's own thread and returns its result,
+    so sqlite writes and queries do not block the event loop. A single thread keeps them in order.
+    When the catalog is disabled the work returns straight away, so it runs inline
+    """
+    global _executor
+    if BGG_CATALOG_PATH is None:
+        return func(*args)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bgg-catalog")
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+def close_catalog() -> None:
+    global _connection, _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+    _executor = None
+    if _connection is not None:
+        _connection.close()
+    _connection = None
+
+
+def _to_int(value: object) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_row(game: dict, updated_at: float) -> dict:
+    label = game.get('label') or normalize(game['name'])
+    return {
+        "objectid": int(game['objectid']),
+        "name": normalize(label, True),
+        "label": label,
+        "type": game.get('type') or "boardgame",
+        "yearpublished": game.get('yearpublished'),
+        "usersrated": _to_int(game.get('usersrated')),
+        "updated_at": updated_at
+    }
+
+
+def add_games(games: list) -> int:
+    """
+    adds or updates games in the catalog; does nothing when the catalog is disabled
+    :param list games: game details or collection games, each with at least an objectid and a label or name
+    :return: the number of games written
+    """
+    connection = get_catalog()
+    if connection is None or not games:
+        return 0
+
+    updated_at = time.time()
+    with timed("catalog_write"), connection:
+        connection.executemany(_UPSERT, [_to_row(game, updated_at) for game in games])
+    return len(games)
+
+
+def import_dump(path: str) -> int:
+    """
+    bulk loads a csv dump of bgg games, e.g. the boardgames_ranks.csv data dump, into the catalog.
+    The file needs "id" and "name" columns; "yearpublished", "usersrated" and "is_expansion" are used when present.
+    Once a dump has been imported the catalog is treated as complete and also answers partial name searches
+    :param str path: the csv file to import
+    :return: the number of games imported
+    """
+    connection = get_catalog()
+    if connection is None:
+        raise RuntimeError("BGG_CATALOG_PATH is not set")
+
+    imported = 0
+    updated_at = time.time()
+    with open(path, newline="", encoding="utf-8") as dump_file:
+        batch = []
+        for record in csv.DictReader(dump_file):
+            if not record.get('id') or not record.get('name'):
+                continue
+            batch.append(_to_row({
+                "objectid": record['id'],
+                "label": normalize(record['name']),
+                "type": "boardgameexpansion" if record.get('is_expansion') == "1" else "boardgame",
+                "yearpublished": record.get('yearpublished') or None,
+                "usersrated": record.get('usersrated')
+            }, updated_at))
+            if len(batch) >= CATALOG_IMPORT_BATCH_SIZE:
+                with connection:
+                    connection.executemany(_UPSERT, batch)
+                imported += len(batch)
+                batch = []
+        with connection:
+            connection.executemany(_UPSERT, batch)
+            connection.execute("INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('imported_at', ?)", (str(updated_at),))
+        imported += len(batch)
+
+    logger.info(f"imported {imported} games into the catalog from {path}")
+    return imported
+
+
+def is_catalog_complete() -> bool:
+    """
+    True when a full dump has been imported, rather than only the games the bot has fetched
+    """
+    connection = get_catalog()
+    if connection is None:
+        return False
+    return connection.execute("SELECT 1 FROM catalog_meta WHERE key = 'imported_at'").fetchone() is not None
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _query_games(connection: sqlite3.Connection, query: str, limit: int) -> list:
+    words = query.split()
+    if not words:
+        return []
+    ranking = "g.name = :query DESC, g.name LIKE :prefix ESCAPE '\\' DESC, COALESCE(g.usersrated, 0) DESC"
+    params = {"query": query, "prefix": f"{_escape_like(query)}%", "limit": limit}
+
+    if _has_fts:
+        # every word must match, the last one as a prefix since it may still be being typed
+        params["match"] = " ".join(f'"{word}"' for word in words) + "*"
+        sql = f"""
+            SELECT g.* FROM games_fts JOIN games g ON g.objectid = games_fts.rowid
+            WHERE games_fts MATCH :match
+            ORDER BY {ranking}, bm25(games_fts)
+            LIMIT :limit
+        """
+    else:
+        conditions = []
+        for index, word in enumerate(words):
+            params[f"word{index}"] = f"%{_escape_like(word)}%"
+            conditions.append(f"g.name LIKE :word{index} ESCAPE '\\'")
+        sql = f"SELECT g.* FROM games g WHERE {' AND '.join(conditions)} ORDER BY {ranking} LIMIT :limit"
+
+    return connection.execute(sql, params).fetchall()
+
+
+def search_catalog(query: str, limit: int = CATALOG_SEARCH_LIMIT) -> list:
+    """
+    searches the local catalog by game name, best matches first: exact names, then names starting with
+    the query, then the most rated games containing every word. Until a full dump has been imported only
+    exact name matches count as a hit, since a partial catalog cannot tell whether a better match exists
+    :param str query: the normalized, lowercased search text
+    :param int limit: the maximum number of results to return
+    :return: a list of search results in the shape returned by search_bgg, or an empty list on a miss
+    """
+    connection = get_catalog()
+    if connection is None:
+        return []
+
+    query = " ".join(query.replace('"', " ").split())
+    with timed("catalog_search"):
+        rows = _query_games(connection, query, limit)
+
+    if not rows or (rows[0]['name'] != query and not is_catalog_complete()):
+        increment("catalog.misses")
+        return []
+
+    increment("catalog.hits")
+    return [
+        {
+            "objectid": str(row['objectid']),
+            "type": row['type'],
+            "name": row['label'],
+            "yearpublished": row['yearpublished']
+        }
+        for row in rows
+    ]
+
+
+def get_catalog_stats() -> dict:
+    connection = get_catalog()
+    if connection is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "games": connection.execute("SELECT COUNT(*) FROM games").fetchone()[0],
+        "complete": is_catalog_complete(),
+        "full_text_search": _has_fts
+    }
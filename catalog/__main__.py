@@ -0,0 +1,34 @@
+"""
+imports a csv dump of bgg games into the local game catalog:
+    python -m catalog boardgames_ranks.csv [--path catalog.sqlite]
+"""
+import argparse
+
+from dotenv import load_dotenv
+
+# load .env before the catalog reads BGG_CATALOG_PATH from the environment
+load_dotenv()
+
+import catalog
+from utils.metrics import configure_logging
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="import a bgg games csv dump into the local game catalog")
+    parser.add_argument("dump", help="csv file with id and name columns, e.g. boardgames_ranks.csv")
+    parser.add_argument("--path", default=catalog.BGG_CATALOG_PATH, help="the catalog file, defaults to BGG_CATALOG_PATH")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("set BGG_CATALOG_PATH or pass --path")
+
+    configure_logging()
+    catalog.BGG_CATALOG_PATH = args.path
+    try:
+        catalog.import_dump(args.dump)
+        print(catalog.get_catalog_stats())
+    finally:
+        catalog.close_catalog()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+import bgg
+import cache
+from bench.mock_server import MockBggConfig, start_mock_server
+from bgg import client
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """
+    gives every test its own cache directory and fresh module level state; each test runs its own event loop,
+    so nothing bound to a loop may be shared between tests
+    """
+    monkeypatch.setattr(cache, "CACHE_ROOT", str(tmp_path / "cache"))
+    cache._prepared_cache_types.clear()
+    cache._memory_cache.clear()
+    bgg._inflight.clear()
+    monkeypatch.setattr(bgg, "_refresh_semaphore", None)
+    monkeypatch.setattr(client, "rate_limiter", client.TokenBucket(1000, 1000))
+    monkeypatch.setattr(client, "BGG_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(client, "BGG_RETRY_MAX_DELAY", 0.05)
+    yield
+    cache._memory_cache.clear()
+    bgg._inflight.clear()
+
+
+@pytest.fixture
+def mock_bgg(monkeypatch):
+    """
+    returns an async context manager serving bench.mock_server in the running event loop and pointing the
+    bgg client at it; keyword arguments are MockBggConfig options
+    """
+    @asynccontextmanager
+    async def serve(**options):
+        config = MockBggConfig(**{"latency": 0, **options})
+        runner, base_url = await start_mock_server(config)
+        monkeypatch.setattr(client, "BGG_API_BASE_URL", base_url)
+        try:
+            yield config
+        finally:
+            await client.close_http_session()
+            await runner.cleanup()
+
+    return serve
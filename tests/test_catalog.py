@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+import pytest
+
+import bgg
+import catalog
+from catalog import run_catalog, search_catalog
+
+
+@pytest.fixture(autouse=True)
+def catalog_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, "BGG_CATALOG_PATH", str(tmp_path / "catalog.sqlite"))
+    yield
+    catalog.close_catalog()
+
+
+def test_fetched_games_are_searchable_off_the_event_loop(mock_bgg, monkeypatch):
+    threads = set()
+    add_games = catalog.add_games
+
+    def record_thread_and_add_games(games: list) -> int:
+        threads.add(threading.current_thread().name)
+        return add_games(games)
+
+    monkeypatch.setattr(bgg, "add_games_to_catalog", record_thread_and_add_games)
+
+    async def main():
+        async with mock_bgg(collection_size=10):
+            collection = await bgg.get_bgg_collection("a")
+            await bgg.get_game_details(collection["games"][0]["objectid"])
+            return collection, await run_catalog(search_catalog, collection["games"][0]["name"])
+
+    collection, search_results = asyncio.run(main())
+    assert threads and all(name.startswith("bgg-catalog") for name in threads)
+    assert search_results[0]["objectid"] == collection["games"][0]["objectid"]
+
+
+def test_partial_catalog_only_answers_exact_names():
+    catalog.add_games([{"objectid": "27710", "label": "Catan Junior", "name": "catan junior"}])
+    assert search_catalog("catan") == []
+    assert [result["objectid"] for result in search_catalog("catan junior")] == ["27710"]
+
+
+def test_disabled_catalog_does_not_start_a_thread(monkeypatch):
+    monkeypatch.setattr(catalog, "BGG_CATALOG_PATH", None)
+
+    async def main():
+        return await run_catalog(search_catalog, "catan")
+
+    assert asyncio.run(main()) == []
+    assert catalog._executor is None
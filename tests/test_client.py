@@ -0,0 +1,117 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+
+import bgg
+import bot
+from bgg import client, groups
+
+
+class FakeContext:
+    def __init__(self):
+        self.sent = []
+        self.guild = None
+
+    async def send(self, content: str = None, **kwargs) -> None:
+        self.sent.append(content)
+
+
+def test_queued_collection_is_retried_until_ready(mock_bgg):
+    async def main():
+        async with mock_bgg(collection_size=10, queued_first=2) as config:
+            collection = await bgg.get_bgg_collection("a")
+            return collection, config.request_counts
+
+    collection, request_counts = asyncio.run(main())
+    assert collection["total_games"] == 10
+    assert request_counts["collection"] == 3
+
+
+@pytest.mark.parametrize("retry_after", [
+    lambda: 1,
+    lambda: formatdate(time.time() + 2, usegmt=True)
+], ids=["seconds", "http-date"])
+def test_retry_after_is_honored(mock_bgg, retry_after):
+    async def main():
+        async with mock_bgg(throttled_first=1, retry_after=retry_after()) as config:
+            start = time.monotonic()
+            resp = await client.bgg_get("thing", {"id": "1", "stats": 1})
+            return resp, time.monotonic() - start, config.request_counts
+
+    resp, elapsed, request_counts = asyncio.run(main())
+    assert resp.status_code == 200
+    assert request_counts["thing"] == 2
+    # the backoff alone would only have waited around BGG_RETRY_BASE_DELAY
+    assert elapsed >= 0.9
+
+
+def test_retry_after_beyond_max_wait_gives_up(mock_bgg, monkeypatch):
+    monkeypatch.setattr(client, "BGG_RETRY_MAX_WAIT", 1)
+
+    async def main():
+        async with mock_bgg(throttled_rate=1, retry_after=30) as config:
+            start = time.monotonic()
+            resp = await client.bgg_get("thing", {"id": "1", "stats": 1})
+            return resp, time.monotonic() - start, config.request_counts
+
+    resp, elapsed, request_counts = asyncio.run(main())
+    assert resp.status_code == 429
+    assert request_counts["thing"] == 1
+    assert elapsed < 1
+
+
+def test_spent_retry_budget_raises_typed_errors(mock_bgg, monkeypatch):
+    monkeypatch.setattr(client, "BGG_RETRY_MAX_WAIT", 0.1)
+
+    async def main():
+        async with mock_bgg(throttled_rate=1):
+            with pytest.raises(bgg.BggRequestError):
+                await bgg.get_game_details(13)
+            with pytest.raises(bgg.BggRequestError):
+                await bgg.search_bgg("catan")
+            with pytest.raises(bgg.BggCollectionError):
+                await bgg.get_bgg_collection("a")
+
+    asyncio.run(main())
+
+
+def test_game_command_reports_bgg_errors(mock_bgg, monkeypatch, tmp_path):
+    monkeypatch.setattr(client, "BGG_RETRY_MAX_WAIT", 0.1)
+    monkeypatch.setattr(groups, "BGG_GROUPS_PATH", str(tmp_path / "groups.json"))
+    monkeypatch.setattr(groups, "_groups", None)
+    ctx = FakeContext()
+
+    async def main():
+        async with mock_bgg(throttled_rate=1):
+            await bot.game.callback(ctx, game_name="catan")
+
+    asyncio.run(main())
+    assert "Could not look up `catan` on BGG" in ctx.sent[-1]
+
+
+def test_token_bucket_paces_requests():
+    async def main():
+        bucket = client.TokenBucket(rate=20, capacity=2)
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(main())
+    # the burst of 2 is immediate, the other 4 requests wait for a token every 50ms
+    assert 0.18 <= elapsed < 0.5
+
+
+def test_rate_limiter_paces_requests_to_bgg(mock_bgg, monkeypatch):
+    async def main():
+        monkeypatch.setattr(client, "rate_limiter", client.TokenBucket(rate=20, capacity=1))
+        async with mock_bgg() as config:
+            start = time.monotonic()
+            await asyncio.gather(*[client.bgg_get("thing", {"id": str(objectid), "stats": 1}) for objectid in range(5)])
+            return time.monotonic() - start, config.request_counts
+
+    elapsed, request_counts = asyncio.run(main())
+    assert request_counts["thing"] == 5
+    assert elapsed >= 0.18
@@ -0,0 +1,52 @@
+import asyncio
+import socket
+
+import aiohttp
+
+import bgg
+from bgg import client
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_get_bgg_collections_reports_unreachable_users(monkeypatch):
+    monkeypatch.setattr(client, "BGG_API_BASE_URL", f"http://127.0.0.1:{_closed_port()}/xmlapi2")
+
+    async def main():
+        try:
+            return await bgg.get_bgg_collections(["a", "b"])
+        finally:
+            await client.close_http_session()
+
+    collections, errors = asyncio.run(main())
+    assert collections == []
+    assert [username for username, _ in errors] == ["a", "b"]
+    assert all(isinstance(e, aiohttp.ClientError) for _, e in errors)
+
+
+def test_get_bgg_collections_reports_timed_out_users(mock_bgg, monkeypatch):
+    monkeypatch.setattr(client, "BGG_HTTP_TIMEOUT", 0.05)
+
+    async def main():
+        async with mock_bgg(latency=1):
+            return await bgg.get_bgg_collections(["a", "b"])
+
+    collections, errors = asyncio.run(main())
+    assert collections == []
+    assert all(isinstance(e, asyncio.TimeoutError) for _, e in errors)
+
+
+def test_get_bgg_collections_keeps_collections_of_other_users(mock_bgg):
+    async def main():
+        async with mock_bgg(collection_size=10):
+            await bgg.get_bgg_collection("a")
+            client.BGG_API_BASE_URL = f"http://127.0.0.1:{_closed_port()}/xmlapi2"
+            return await bgg.get_bgg_collections(["a", "b"])
+
+    collections, errors = asyncio.run(main())
+    assert [collection["owner"] for collection in collections] == ["a"]
+    assert [username for username, _ in errors] == ["b"]
@@ -0,0 +1,127 @@
+import asyncio
+import copy
+
+import bgg
+from bgg.combined import CombinedCollection
+from bgg.search import MATCH_EXACT
+
+
+def make_game(objectid: str, name: str, owner: str, **fields) -> dict:
+    return {"owned_by": [owner], "type": "boardgame", "objectid": objectid, "label": name.title(), "name": name, **fields}
+
+
+def make_collection(owner: str, games: list) -> dict:
+    games = [make_game(objectid, name, owner) if isinstance(name, str) else name for objectid, name in games]
+    return {
+        "type": "UserCollection",
+        "owner": owner,
+        "games": games,
+        "game_list": [game["name"] for game in games],
+        "game_id_list": [game["objectid"] for game in games],
+        "total_games": len(games)
+    }
+
+
+def test_games_are_combined_by_objectid_with_every_owner():
+    combined = CombinedCollection([
+        make_collection("a", [("1", "catan"), ("2", "azul")]),
+        make_collection("b", [("2", "azul"), ("3", "root")])
+    ])
+    assert len(combined) == 3
+    assert combined.get_game("2")["owned_by"] == ["a", "b"]
+    assert combined.get_game("1")["owned_by"] == ["a"]
+    assert combined.get_game("4") is None
+    assert "3" in combined and "4" not in combined
+
+
+def test_replacing_a_contribution_applies_added_removed_and_changed_games():
+    combined = CombinedCollection([
+        make_collection("a", [("1", "catan"), ("2", "azul"), ("3", "root")]),
+        make_collection("b", [("2", "azul")])
+    ])
+    combined.to_dict()
+    combined.update_collection(make_collection("a", [("2", "azul"), ("3", "root the woodland"), ("4", "wingspan")]))
+
+    assert sorted(game["objectid"] for game in combined.games()) == ["2", "3", "4"]
+    assert combined.get_game("1") is None
+    assert combined.get_game("2")["owned_by"] == ["a", "b"]
+    assert combined.get_game("3")["name"] == "root the woodland"
+    assert combined.to_dict()["game_list"] == ["azul", "root the woodland", "wingspan"]
+    assert combined.search("catan", fuzzy=False) == []
+    assert combined.search("wingspan")[0] == (MATCH_EXACT, combined.get_game("4"))
+    assert combined.search("root the woodland")[0][1]["objectid"] == "3"
+
+
+def test_replacing_a_contribution_with_an_equal_copy_changes_nothing():
+    collection = make_collection("a", [("1", "catan"), ("2", "azul")])
+    combined = CombinedCollection([collection])
+    snapshot = combined.to_dict()
+    assert combined.update_collection(collection) is False
+    assert combined.update_collection(copy.deepcopy(collection)) is True
+    assert combined.to_dict() is snapshot
+
+
+def test_removing_an_owner_keeps_games_of_other_owners():
+    combined = CombinedCollection([
+        make_collection("a", [("1", "catan"), ("2", "azul")]),
+        make_collection("b", [("2", "azul")])
+    ])
+    combined.remove_collection("a")
+    combined.remove_collection("missing")
+    assert combined.owners == ["b"]
+    assert [game["objectid"] for game in combined.games()] == ["2"]
+    assert combined.get_game("2")["owned_by"] == ["b"]
+    assert combined.search("catan", fuzzy=False) == []
+
+    combined.remove_collection("b")
+    assert len(combined) == 0
+    assert combined.to_dict()["games"] == []
+
+
+def test_owner_order_follows_the_order_collections_were_added():
+    combined = CombinedCollection([make_collection(owner, [("1", "catan")]) for owner in ("c", "a", "b")])
+    assert combined.owners == ["c", "a", "b"]
+    assert combined.get_game("1")["owned_by"] == ["c", "a", "b"]
+
+    # refreshing an owner keeps their place, removing and re-adding moves them last
+    combined.update_collection(make_collection("c", [("1", "catan"), ("2", "azul")]))
+    assert combined.owners == ["c", "a", "b"]
+    assert combined.get_game("1")["owned_by"] == ["c", "a", "b"]
+    combined.remove_collection("c")
+    combined.update_collection(make_collection("c", [("1", "catan")]))
+    assert combined.owners == ["a", "b", "c"]
+    assert combined.get_game("1")["owned_by"] == ["a", "b", "c"]
+
+
+def test_to_dict_keeps_the_combine_bgg_collections_shape():
+    collections = [
+        make_collection("a", [("2", "catan"), ("10", "azul")]),
+        make_collection("b", [("10", "azul"), ("3", "root")])
+    ]
+    combined = asyncio.run(bgg.combine_bgg_collections(collections))
+
+    assert combined["type"] == "CombinedUserCollection"
+    assert combined["owner"] == ["a", "b"]
+    assert combined["game_list"] == ["azul", "catan", "root"]
+    assert combined["game_id_list"] == sorted(["2", "10", "3"])
+    assert combined["total_games"] == 3
+    games = {game["objectid"]: game for game in combined["games"]}
+    assert games["10"] == make_game("10", "azul", "a", owned_by=["a", "b"])
+    assert games["3"]["owned_by"] == ["b"]
+
+
+def test_inputs_are_never_mutated():
+    collections = [
+        make_collection("a", [("1", "catan"), ("2", "azul")]),
+        make_collection("b", [("2", "azul"), ("3", "root")])
+    ]
+    originals = copy.deepcopy(collections)
+
+    combined = CombinedCollection(collections)
+    combined.to_dict()
+    combined.get_game("2")["owned_by"].append("c")
+    combined.update_collection(make_collection("a", [("2", "azul")]))
+    combined.remove_collection("b")
+    asyncio.run(bgg.combine_bgg_collections(collections))
+
+    assert collections == originals
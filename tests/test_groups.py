@@ -0,0 +1,74 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+from bgg import groups
+from bgg.groups import DEFAULT_GROUP, CollectionGroup
+from tests.test_client import FakeContext
+
+
+@pytest.fixture(autouse=True)
+def default_group(tmp_path, monkeypatch):
+    monkeypatch.setattr(groups, "BGG_GROUPS_PATH", str(tmp_path / "groups.json"))
+    monkeypatch.setattr(groups, "_groups", {DEFAULT_GROUP: CollectionGroup(DEFAULT_GROUP, ["a", "b"])})
+
+
+def _guild_context(guild_id: int = 1) -> FakeContext:
+    ctx = FakeContext()
+    ctx.guild = SimpleNamespace(id=guild_id)
+    return ctx
+
+
+def test_users_removed_while_loading_stay_out_of_the_group(mock_bgg):
+    group = groups.get_group(DEFAULT_GROUP)
+
+    async def main():
+        async with mock_bgg(collection_size=10, latency=0.05):
+            loading = asyncio.ensure_future(group.load())
+            await asyncio.sleep(0.01)
+            group.remove_user("a")
+            return await loading
+
+    combined, errors = asyncio.run(main())
+    assert errors == []
+    assert combined.owners == ["b"]
+    assert group.usernames == ["b"]
+
+
+def test_new_groups_start_from_a_copy_of_the_default_group():
+    group = groups.get_group("1", create=True)
+    group.add_user("c")
+    assert group.usernames == ["a", "b", "c"]
+    assert groups.get_group(DEFAULT_GROUP).usernames == ["a", "b"]
+    assert groups.get_group("2").usernames == ["a", "b"]
+
+
+def test_removing_a_default_user_gives_the_server_its_own_group():
+    ctx = _guild_context()
+
+    asyncio.run(bot.remove_collection.callback(ctx, "b"))
+    assert ctx.sent[-1] == "removed b's collection"
+    assert groups.get_group("1").usernames == ["a"]
+    assert groups.get_group(DEFAULT_GROUP).usernames == ["a", "b"]
+    with open(groups.BGG_GROUPS_PATH) as infile:
+        assert json.load(infile) == {DEFAULT_GROUP: ["a", "b"], "1": ["a"]}
+
+    asyncio.run(bot.remove_collection.callback(ctx, "b"))
+    assert ctx.sent[-1] == "b's collection is not known in this server"
+
+
+def test_adding_a_default_user_is_already_known(mock_bgg):
+    ctx = _guild_context()
+
+    async def main():
+        async with mock_bgg(collection_size=10):
+            await bot.add_collection.callback(ctx, "a")
+            await bot.add_collection.callback(ctx, "c")
+
+    asyncio.run(main())
+    assert ctx.sent[0] == "a's collection is already known in this server"
+    assert ctx.sent[-1].startswith("added c's collection")
+    assert groups.get_group("1").usernames == ["a", "b", "c"]
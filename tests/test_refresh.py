@@ -0,0 +1,80 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import bgg
+import cache
+from utils.metrics import get_metrics
+
+
+def _age_collection_caches(usernames: list, hours: float) -> None:
+    cache._memory_cache.clear()
+    aged = time.time() - hours * 60 * 60
+    for username in usernames:
+        os.utime(cache.get_cache_path("collection", username), (aged, aged))
+
+
+def test_warming_while_stale_entries_revalidate_does_not_deadlock(mock_bgg):
+    usernames = [f"u{user}" for user in range(5)]
+
+    async def main():
+        async with mock_bgg(collection_size=20, latency=0.05):
+            await bgg.get_bgg_collections(usernames)
+            _age_collection_caches(usernames, 7)
+
+            warming = asyncio.ensure_future(bgg.warm_caches(usernames))
+            await asyncio.sleep(0)
+            # serves the stale entries and starts background refreshes for them
+            await bgg.get_bgg_collections(usernames)
+
+            refreshed = await asyncio.wait_for(warming, timeout=10)
+            collection = await asyncio.wait_for(bgg.get_bgg_collection("u3", refresh=True), timeout=10)
+            return refreshed, collection
+
+    refreshed, collection = asyncio.run(main())
+    assert sorted(refreshed_collection["owner"] for refreshed_collection in refreshed) == usernames
+    assert collection["owner"] == "u3"
+    assert bgg._inflight == {}
+
+
+def _count_incremental_refreshes() -> int:
+    return get_metrics()["counters"].get("collection_incremental_refreshes", 0)
+
+
+@pytest.mark.parametrize("stale_while_revalidate, age_hours", [(False, 7), (True, 24 * 8)], ids=["without-swr", "beyond-stale-max"])
+def test_expired_collection_is_refreshed_incrementally(mock_bgg, monkeypatch, stale_while_revalidate, age_hours):
+    monkeypatch.setattr(bgg, "BGG_STALE_WHILE_REVALIDATE", stale_while_revalidate)
+    monkeypatch.setattr(bgg, "BGG_COLLECTION_FULL_REFRESH", 24 * 30)
+
+    async def main():
+        async with mock_bgg(collection_size=20, modified_items=3):
+            first = await bgg.get_bgg_collection("a")
+            _age_collection_caches(["a"], age_hours)
+            incremental_refreshes = _count_incremental_refreshes()
+            refreshed = await bgg.get_bgg_collection("a")
+            return first, refreshed, _count_incremental_refreshes() - incremental_refreshes
+
+    first, refreshed, incremental_refreshes = asyncio.run(main())
+    assert incremental_refreshes == 1
+    assert sorted(refreshed["game_id_list"]) == sorted(first["game_id_list"])
+
+
+def test_full_refresh_drops_games_removed_from_the_collection(mock_bgg, monkeypatch):
+    monkeypatch.setattr(bgg, "BGG_COLLECTION_FULL_REFRESH", 24 * 30)
+
+    async def main():
+        async with mock_bgg(collection_size=20, modified_items=3):
+            first = await bgg.get_bgg_collection("a")
+            # a game that has since been removed on bgg, which changes since the cached copy do not report
+            removed_game = dict(first["games"][0], objectid="999999", name="removed game")
+            cache.create_cache("collection", "a", dict(first, games=first["games"] + [removed_game]))
+            cache._memory_cache.clear()
+            incremental = await bgg.get_bgg_collection("a", refresh=True)
+            full = await bgg.get_bgg_collection("a", refresh=True, full=True)
+            return first, incremental, full
+
+    first, incremental, full = asyncio.run(main())
+    assert "999999" in [game["objectid"] for game in incremental["games"]]
+    assert sorted(game["objectid"] for game in full["games"]) == sorted(first["game_id_list"])
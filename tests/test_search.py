@@ -0,0 +1,110 @@
+import pytest
+
+from bgg import search
+
+from bgg.search import (
+    MATCH_EXACT,
+    MATCH_FUZZY,
+    MATCH_PREFIX,
+    MATCH_SUBSTRING,
+    MATCH_WORD_PREFIX,
+    SearchIndex
+)
+
+
+NAMES = {
+    "1": "catan",
+    "2": "catan junior",
+    "3": "star wars catan",
+    "4": "scatangled",
+    "5": "carcassonne",
+    "6": "ticket to ride",
+    "7": "cataan"
+}
+
+
+@pytest.fixture
+def index() -> SearchIndex:
+    index = SearchIndex()
+    for key, name in NAMES.items():
+        index.add(key, name)
+    return index
+
+
+def test_results_are_ranked_exact_prefix_word_prefix_substring_fuzzy(index):
+    assert index.search("catan") == [
+        (MATCH_EXACT, "1"),
+        (MATCH_PREFIX, "2"),
+        (MATCH_WORD_PREFIX, "3"),
+        (MATCH_SUBSTRING, "4"),
+        (MATCH_FUZZY, "7")
+    ]
+
+
+def test_unrelated_names_are_not_fuzzy_matches(index):
+    keys = [key for _, key in index.search("catan")]
+    assert "5" not in keys and "6" not in keys
+    assert index.search("zzzzzz") == []
+
+
+def test_misspelled_query_only_finds_fuzzy_matches(index):
+    results = index.search("catann")
+    assert results and all(rank == MATCH_FUZZY for rank, _ in results)
+    assert results[0][1] in ("1", "7")
+
+
+def test_fuzzy_matches_can_be_left_out(index):
+    assert index.search("catan", fuzzy=False)[-1] == (MATCH_SUBSTRING, "4")
+    assert index.search("catann", fuzzy=False) == []
+
+
+def test_limit_keeps_the_best_matches(index):
+    assert index.search("catan", limit=2) == [(MATCH_EXACT, "1"), (MATCH_PREFIX, "2")]
+
+
+def test_ties_prefer_shorter_names():
+    index = SearchIndex()
+    index.add("long", "catan seafarers")
+    index.add("short", "catan junior")
+    assert index.search("catan") == [(MATCH_PREFIX, "short"), (MATCH_PREFIX, "long")]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("ca", [(MATCH_PREFIX, "1"), (MATCH_PREFIX, "7"), (MATCH_PREFIX, "5"), (MATCH_PREFIX, "2"), (MATCH_WORD_PREFIX, "3"), (MATCH_SUBSTRING, "4")]),
+    ("t", [(MATCH_PREFIX, "6"), (MATCH_SUBSTRING, "1"), (MATCH_SUBSTRING, "7"), (MATCH_SUBSTRING, "4"), (MATCH_SUBSTRING, "2"), (MATCH_SUBSTRING, "3")]),
+    ("w", [(MATCH_WORD_PREFIX, "3")]),
+    ("", [])
+])
+def test_queries_shorter_than_a_trigram_match_by_substring(index, query, expected):
+    assert index.search(query) == expected
+
+
+def test_added_names_are_found(index):
+    index.add("8", "catan plus")
+    assert (MATCH_PREFIX, "8") in index.search("catan")
+    assert len(index) == len(NAMES) + 1
+
+
+def test_removed_names_are_not_found(index):
+    index.remove("1")
+    index.remove("missing")
+    assert index.search("catan", fuzzy=False) == [(MATCH_PREFIX, "2"), (MATCH_WORD_PREFIX, "3"), (MATCH_SUBSTRING, "4")]
+    assert len(index) == len(NAMES) - 1
+    for key in NAMES:
+        index.remove(key)
+    assert index.search("catan") == []
+    assert index._postings == {}
+
+
+def test_renamed_names_are_reindexed(index):
+    index.add("1", "azul")
+    assert index.search("azul") == [(MATCH_EXACT, "1")]
+    assert (MATCH_EXACT, "1") not in index.search("catan")
+    assert len(index) == len(NAMES)
+
+
+def test_fuzzy_matches_need_the_minimum_similarity(index, monkeypatch):
+    monkeypatch.setattr(search, "FUZZY_MIN_SIMILARITY", 1.0)
+    assert index.search("catann") == []
+    monkeypatch.setattr(search, "FUZZY_MIN_SIMILARITY", 0.0)
+    assert "6" not in [key for _, key in index.search("catann")]
@@ -0,0 +1,96 @@
+import random
+import string
+
+import pytest
+from cleantext import clean
+
+from utils import text
+from utils.text import NORMALIZE_CACHE_MAX_LENGTH, normalize, normalize_many
+
+
+def reference_normalize(content: str, to_lower: bool) -> str:
+    # the normalization from before the memo and the plain ascii shortcut were added
+    return clean(content, normalize_whitespace=True, fix_unicode=True, no_line_breaks=True, lower=to_lower, no_punct=True)
+
+
+def _random_plain_names(count: int) -> list:
+    rng = random.Random(8)
+    alphabet = string.ascii_letters + string.digits
+    return [
+        " ".join("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10))) for _ in range(rng.randint(1, 5)))
+        for _ in range(count)
+    ]
+
+
+NAMES = [
+    "Catan",
+    "Ticket to Ride Europe",
+    "7 Wonders Duel",
+    "CATAN",
+    "Brass: Birmingham",
+    "Twilight Imperium (Fourth Edition)",
+    "Star Wars: X-Wing Miniatures Game – The Force Awakens Core Set",
+    "Tzolk'in: The Mayan Calendar",
+    "Puerto Rico!",
+    "  leading and trailing spaces  ",
+    "double  spaces",
+    "line\nbreaks\r\nhere",
+    "Café Culture",
+    "Die Macher",
+    "Kakerlakensalat™",
+    "Ōkami",
+    "ナンジャモンジャ",
+    "Agricola 🐑",
+    "Æon's End",
+    "Sushi Go Party!",
+    "café",
+    "",
+    "a",
+    None,
+]
+LONG_TEXTS = [
+    "A long description with punctuation, unicode ñ and line breaks.\n" * 10,
+    " ".join(["plain words only"] * 40),
+    None,
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_memo():
+    text._clean_cached.cache_clear()
+    yield
+    text._clean_cached.cache_clear()
+
+
+@pytest.mark.parametrize("to_lower", [False, True])
+def test_normalize_matches_clean(to_lower):
+    for content in NAMES + LONG_TEXTS:
+        assert normalize(content, to_lower) == reference_normalize(content, to_lower), content
+
+
+@pytest.mark.parametrize("to_lower", [False, True])
+def test_normalize_matches_clean_for_plain_ascii(to_lower):
+    names = _random_plain_names(1000)
+    assert all(text._PLAIN_TEXT.fullmatch(name) for name in names)
+    for name in names:
+        assert normalize(name, to_lower) == reference_normalize(name, to_lower), name
+
+
+@pytest.mark.parametrize("to_lower", [False, True])
+def test_normalize_matches_clean_for_long_text(to_lower):
+    for content in LONG_TEXTS[:2]:
+        assert len(content) > NORMALIZE_CACHE_MAX_LENGTH
+        assert normalize(content, to_lower) == reference_normalize(content, to_lower)
+
+
+@pytest.mark.parametrize("to_lower", [False, True])
+def test_normalize_is_stable_when_memoized(to_lower):
+    first = [normalize(content, to_lower) for content in NAMES]
+    second = [normalize(content, to_lower) for content in NAMES]
+    assert first == second == [reference_normalize(content, to_lower) for content in NAMES]
+
+
+@pytest.mark.parametrize("to_lower", [False, True])
+def test_normalize_many_matches_clean(to_lower):
+    contents = NAMES + NAMES[::-1] + _random_plain_names(50)
+    assert normalize_many(contents, to_lower) == [reference_normalize(content, to_lower) for content in contents]
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH")
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", 0.25))
+
+# upper bounds of the histogram buckets in milliseconds; the last bucket catches everything slower
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+logger = logging.getLogger("bggbot")
+
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """
+    sets up log output for the bot's loggers
+    :param str level: a logging level name, e.g. "DEBUG" | "INFO" | "WARNING"
+    """
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logger.setLevel(level.upper())
+
+
+class Histogram:
+    """
+    Bucketed latency histogram; percentiles are estimated from the bucket bounds
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, duration_ms: float) -> None:
+        self.counts[bisect_left(HISTOGRAM_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def percentile(self, percent: float) -> float:
+        """
+        returns the upper bound of the bucket holding the given percentile, capped at the slowest observation
+        """
+        if self.count == 0:
+            return 0.0
+        threshold = self.count * percent / 100
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= threshold:
+                if bucket < len(HISTOGRAM_BUCKETS_MS):
+                    return min(HISTOGRAM_BUCKETS_MS[bucket], self.max_ms)
+                break
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": dict(zip([str(bound) for bound in HISTOGRAM_BUCKETS_MS] + ["inf"], self.counts))
+        }
+
+
+_histograms = {}
+_counters = {}
+
+
+def observe(stage: str, duration_ms: float) -> None:
+    """
+    records how long a stage took
+    :param str stage: the name of the stage, e.g. "bgg_request.thing"
+    :param float duration_ms: the duration in milliseconds
+    """
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        histogram = _histograms[stage] = Histogram()
+    histogram.observe(duration_ms)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    times the wrapped block and records it under stage
+    :param str stage: the name of the stage, e.g. "xml_parse.collection"
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, (time.perf_counter() - start) * 1000)
+
+
+def increment(counter: str, amount: int = 1) -> None:
+    """
+    adds to a named counter
+    :param str counter: the name of the counter, e.g. "bgg_status.200"
+    """
+    _counters[counter] = _counters.get(counter, 0) + amount
+
+
+def get_metrics() -> dict:
+    """
+    returns every histogram and counter recorded so far
+    """
+    return {
+        "histograms": {stage: histogram.to_dict() for stage, histogram in sorted(_histograms.items())},
+        "counters": dict(sorted(_counters.items()))
+    }
+
+
+def reset_metrics() -> None:
+    _histograms.clear()
+    _counters.clear()
+
+
+def export_metrics(path: str, extra: dict = None) -> None:
+    """
+    writes the current metrics to a json file, replacing it atomically
+    :param str path: the file to write
+    :param dict extra: additional sections to include, e.g. cache statistics
+    """
+    metrics = {"exported_at": time.time(), **get_metrics(), **(extra or {})}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as outfile:
+        json.dump(metrics, outfile, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL) -> None:
+    """
+    records how late the event loop wakes up from a sleep as "event_loop_lag"; anything that blocks
+    the loop thread, like parsing a large response inline, shows up as lag. Runs until cancelled
+    :param float interval: seconds between measurements
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        observe("event_loop_lag", max(0.0, loop.time() - start - interval) * 1000)
@@ -0,0 +1,90 @@
+import os
+
+import discord
+
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 20))
+PAGE_TIMEOUT = float(os.getenv("PAGE_TIMEOUT", 300))
+# discord rejects embed descriptions longer than this
+EMBED_DESCRIPTION_MAX_LENGTH = 4096
+
+
+def get_page_count(total: int, page_size: int = PAGE_SIZE) -> int:
+    """
+    returns the number of pages needed to list total items, at least one so empty lists still render
+    """
+    return max(1, -(-total // page_size))
+
+
+def join_lines(lines: list, max_length: int = EMBED_DESCRIPTION_MAX_LENGTH) -> str:
+    """
+    joins lines for an embed description, dropping the lines that would not fit
+    :param list lines: the lines to join
+    :param int max_length: the maximum length of the result
+    """
+    text = ""
+    for line in lines:
+        if len(text) + len(line) + 1 > max_length:
+            break
+        text = f"{text}\n{line}" if text else line
+    return text
+
+
+class PageView(discord.ui.View):
+    """
+    Previous/next buttons for a paged embed.
+
+    Pages are rendered by render_page only when they are shown, so nothing beyond the current page
+    is built or sent up front.
+    """
+
+    def __init__(self, render_page, page_count: int, page: int = 0, timeout: float = PAGE_TIMEOUT):
+        """
+        :param render_page: called with a zero based page number, returns the Embed for that page
+        :param int page_count: the number of pages
+        :param int page: the zero based page to start on
+        """
+        super().__init__(timeout=timeout)
+        self.render_page = render_page
+        self.page_count = page_count
+        self.page = page
+        self.message = None
+        self._update_buttons()
+
+    def _update_buttons(self) -> None:
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    async def _show_page(self, interaction: discord.Interaction, page: int) -> None:
+        self.page = min(max(page, 0), self.page_count - 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.render_page(self.page), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page + 1)
+
+    async def on_timeout(self) -> None:
+        if self.message is not None:
+            await self.message.edit(view=None)
+
+
+async def send_pages(ctx, render_page, page_count: int, page: int = 0) -> None:
+    """
+    sends the given page of a paged embed, with buttons to move between pages when there is more than one
+    :param ctx: the command context to reply to
+    :param render_page: called with a zero based page number, returns the Embed for that page
+    :param int page_count: the number of pages
+    :param int page: the zero based page to show first; out of range pages are clamped
+    """
+    page = min(max(page, 0), page_count - 1)
+    if page_count <= 1:
+        await ctx.send(embed=render_page(page))
+        return
+
+    view = PageView(render_page, page_count, page)
+    view.message = await ctx.send(embed=render_page(page), view=view)
@@ -1,8 +1,56 @@
+import os
+import re
+from functools import lru_cache
+
 from cleantext import clean
 
+from utils.metrics import timed
+
+
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", 16384))
+# long text such as game descriptions rarely repeats, so it is not worth keeping in the memo
+NORMALIZE_CACHE_MAX_LENGTH = 256
+
+# ascii letters and digits separated by single spaces come out of clean() unchanged apart from
+# lowercasing, so they can skip the cleantext pipeline entirely
+_PLAIN_TEXT = re.compile(r"[A-Za-z0-9]+(?: [A-Za-z0-9]+)*")
+
+
+def _clean(content: str, to_lower: bool) -> str:
+    with timed("normalize"):
+        return clean(content, normalize_whitespace=True, fix_unicode=True, no_line_breaks=True, lower=to_lower, no_punct=True)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _clean_cached(content: str, to_lower: bool) -> str:
+    return _clean(content, to_lower)
+
 
 def normalize(content: str, to_lower: bool = False) -> str:
-    if to_lower:
-        return clean(content, normalize_whitespace=True, fix_unicode=True, no_line_breaks=True, lower=True, no_punct=True)
-    else:
-        return clean(content, normalize_whitespace=True, fix_unicode=True, no_line_breaks=True, lower=False, no_punct=True)
+    if isinstance(content, str):
+        if _PLAIN_TEXT.fullmatch(content):
+            return content.lower() if to_lower else content
+        if len(content) > NORMALIZE_CACHE_MAX_LENGTH:
+            return _clean(content, to_lower)
+    return _clean_cached(content, to_lower)
+
+
+def normalize_many(contents: list, to_lower: bool = False) -> list:
+    """
+    normalizes a list of strings, cleaning each distinct string only once
+    :param list contents: the strings to normalize
+    :param bool to_lower: lowercase the normalized strings
+    """
+    normalized = {}
+    for content in contents:
+        if content not in normalized:
+            normalized[content] = normalize(content, to_lower)
+    return [normalized[content] for content in contents]
+
+
+def get_normalize_stats() -> dict:
+    """
+    returns hit/miss counters of the normalization memo
+    """
+    cache_info = _clean_cached.cache_info()
+    return {"hits": cache_info.hits, "misses": cache_info.misses, "entries": cache_info.currsize, "max_entries": cache_info.maxsize}